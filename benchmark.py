@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""Benchmarks do Wolf contra um servidor de mídia local (nenhum site real é acessado).
+
+Mede a importação e a inicialização, a atualização de cookies, o download único
+(MP4 progressivo, DASH e HLS), o tempo de parede de um lote e a conversão de áudio.
+Cada execução é gravada em JSONL e comparada com a anterior para apontar regressões.
+
+    python benchmark.py                 # todos os benchmarks, 3 repetições
+    python benchmark.py -n 5 --so lote,dash
+"""
+import os
+import sys
+import io
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextlib
+import statistics
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from time import time, perf_counter
+
+import wolf
+
+PASTA_REPOSITORIO = os.path.dirname(os.path.abspath(__file__))
+ARQUIVO_RESULTADOS = os.path.join(wolf.PASTA_WOLF, "benchmarks.jsonl")
+LIMIAR_REGRESSAO = 10  # % de piora que conta como regressão
+BENCHMARKS = ['importacao', 'inicializacao', 'cookies', 'progressivo', 'dash', 'hls', 'lote', 'audio']
+
+COOKIES_FALSOS = ("# Netscape HTTP Cookie File\n"
+                  "127.0.0.1\tFALSE\t/\tFALSE\t0\twolf_benchmark\t1\n")
+
+class _Manipulador(SimpleHTTPRequestHandler):
+    """Servidor estático com os tipos MIME de DASH/HLS e sem log no terminal"""
+    extensions_map = dict(SimpleHTTPRequestHandler.extensions_map, **{
+        '.mpd': 'application/dash+xml',
+        '.m3u8': 'application/vnd.apple.mpegurl',
+        '.m4s': 'video/iso.segment',
+        '.ts': 'video/mp2t',
+    })
+
+    def log_message(self, *args):
+        pass
+
+def iniciar_servidor(pasta):
+    """Sobe o servidor de mídia numa porta livre e devolve (servidor, url base)"""
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), partial(_Manipulador, directory=pasta))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def gerar_midia(pasta, duracao, copias):
+    """Gera a mídia sintética servida pelo servidor local; devolve os cenários disponíveis"""
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, "cookies.txt"), 'w') as f:
+        f.write(COOKIES_FALSOS)
+
+    video = os.path.join(pasta, "video.mp4")
+    if not shutil.which("ffmpeg"):
+        # Sem ffmpeg só dá para servir um arquivo opaco como download progressivo
+        print("\033[1;33m[•] ffmpeg não encontrado: DASH, HLS e áudio ficam de fora\033[0m")
+        with open(video, 'wb') as f:
+            f.write(os.urandom(duracao * 256 * 1024))
+        disponiveis = ['progressivo']
+    else:
+        ffmpeg = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error']
+        subprocess.run(ffmpeg + [
+            '-f', 'lavfi', '-i', 'testsrc2=size=1280x720:rate=30',
+            '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100', '-t', str(duracao),
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-g', '60',
+            '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', video], check=True)
+        os.makedirs(os.path.join(pasta, "hls"), exist_ok=True)
+        subprocess.run(ffmpeg + [
+            '-i', video, '-c', 'copy', '-f', 'hls', '-hls_time', '2', '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', os.path.join(pasta, "hls", "seg_%03d.ts"),
+            os.path.join(pasta, "hls", "index.m3u8")], check=True)
+        os.makedirs(os.path.join(pasta, "dash"), exist_ok=True)
+        subprocess.run(ffmpeg + [
+            '-i', video, '-map', '0:v', '-map', '0:a', '-c', 'copy', '-f', 'dash', '-seg_duration', '2',
+            os.path.join(pasta, "dash", "manifest.mpd")], check=True)
+        disponiveis = ['progressivo', 'dash', 'hls', 'audio']
+
+    # Cópias com nomes próprios para o lote (títulos e chaves do índice diferentes)
+    for i in range(1, copias + 1):
+        os.link(video, os.path.join(pasta, f"lote_{i:02d}.mp4"))
+    return disponiveis
+
+def isolar(pasta, base_url):
+    """Aponta todos os caminhos do Wolf para a pasta do benchmark"""
+    pasta_wolf = os.path.join(pasta, ".wolf")
+    wolf.PASTA_WOLF = pasta_wolf
+    wolf.PASTA_LOGS = os.path.join(pasta_wolf, "logs")
+    wolf.PASTA_CACHE = os.path.join(pasta_wolf, "cache")
+    wolf.PASTA_FONTES = os.path.join(pasta_wolf, "fontes")
+    wolf.PASTA_TRABALHO = os.path.join(pasta_wolf, "trabalho")
+    wolf.ARQUIVO_AMBIENTE = os.path.join(pasta_wolf, "ambiente.json")
+    wolf.ARQUIVO_BANCO = os.path.join(pasta_wolf, "wolf.db")
+    wolf.ARQUIVO_METRICAS = os.path.join(pasta_wolf, "metricas.jsonl")
+    wolf.ARQUIVO_CONFIG = os.path.join(pasta_wolf, "config.json")
+    wolf.ARQUIVO_DAEMON = os.path.join(pasta_wolf, "daemon.json")
+    wolf.ARQUIVO_DISPOSITIVO = os.path.join(pasta_wolf, "dispositivo.json")
+    wolf.PASTA_DOWNLOADS = os.path.join(pasta, "downloads")
+    wolf.ARQUIVO_COOKIES = os.path.join(pasta, "cookies.txt")
+    wolf.URL_ATUALIZACAO_COOKIES = f"{base_url}/cookies.txt"
+    wolf.MODO_INTERATIVO = False
+    # Workers, fragmentos e conversões fixos: os números não podem depender da carga do momento
+    wolf.AJUSTE_AUTOMATICO = False
+
+def limpar_estado():
+    """Esquece downloads, cache de metadados e arquivos baixados entre repetições"""
+    wolf.banco().execute("DELETE FROM downloads")
+    wolf.banco().execute("DELETE FROM sincronizacao")
+    wolf.banco().commit()
+    for pasta in (wolf.PASTA_CACHE, wolf.PASTA_DOWNLOADS, wolf.PASTA_FONTES):
+        shutil.rmtree(pasta, ignore_errors=True)
+
+@contextlib.contextmanager
+def saida_capturada():
+    """Guarda a saída do Wolf; só mostra o final dela se o benchmark falhar"""
+    buffer = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+            yield
+    except BaseException:
+        print("\n".join(buffer.getvalue().splitlines()[-20:]), file=sys.stderr)
+        raise
+
+def medir(funcao, repeticoes, preparar=None):
+    """Roda a função várias vezes; devolve tempos e o último retorno"""
+    tempos = []
+    retorno = None
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        with saida_capturada():
+            inicio = perf_counter()
+            retorno = funcao()
+            tempos.append(perf_counter() - inicio)
+    return tempos, retorno
+
+def resumo(tempos, total_bytes=None, **extra):
+    registro = {'mediana': round(statistics.median(tempos), 4), 'min': round(min(tempos), 4),
+                'max': round(max(tempos), 4)}
+    if total_bytes:
+        registro['vazao'] = round(total_bytes / statistics.median(tempos))
+    registro.update(extra)
+    return registro
+
+def bench_importacao(args, base_url):
+    comando = [sys.executable, '-c', 'import wolf']
+    tempos, _ = medir(lambda: subprocess.run(comando, cwd=PASTA_REPOSITORIO, check=True), args.repeticoes)
+    return resumo(tempos)
+
+@contextlib.contextmanager
+def host_intocado():
+    """Impede que a inicialização instale, atualize ou busque algo fora do benchmark"""
+    def instalar():
+        raise RuntimeError("a inicialização tentou instalar dependências")
+    originais = (wolf.instalar_dependencias_auto, wolf.atualizar_antes_de_carregar, wolf.ATUALIZAR_COOKIES_AUTO)
+    wolf.instalar_dependencias_auto = instalar
+    wolf.atualizar_antes_de_carregar = lambda: None
+    wolf.ATUALIZAR_COOKIES_AUTO = False
+    try:
+        yield
+    finally:
+        wolf.instalar_dependencias_auto, wolf.atualizar_antes_de_carregar, wolf.ATUALIZAR_COOKIES_AUTO = originais
+
+def bench_inicializacao(args, base_url):
+    # Caminho de main(): carregar_config + verificar_e_configurar_ambiente, com o ambiente já configurado.
+    # Só a partida rápida é medida: sem yt-dlp/ffmpeg ela cairia na instalação, que nunca roda aqui.
+    with saida_capturada():
+        wolf.salvar_impressao_ambiente(atualizado=True)
+    if not wolf.ambiente_inalterado(wolf.carregar_impressao_ambiente()):
+        raise RuntimeError("yt-dlp ou ffmpeg ausente: a inicialização instalaria dependências")
+
+    def inicializar():
+        wolf.carregar_config()
+        wolf.verificar_e_configurar_ambiente()
+    with host_intocado():
+        return resumo(medir(inicializar, args.repeticoes)[0])
+
+def bench_cookies(args, base_url):
+    def sem_cookies():
+        wolf._remover_silencioso(wolf.ARQUIVO_COOKIES)
+        wolf._remover_silencioso(wolf._caminho_meta_cookies())
+    completo, _ = medir(partial(wolf.atualizar_cookies, forcar=True), args.repeticoes, sem_cookies)
+    condicional, _ = medir(partial(wolf.atualizar_cookies, forcar=True), args.repeticoes)
+    return resumo(completo, condicional=round(statistics.median(condicional), 4))
+
+def _bench_download(url, args):
+    resultados = []
+
+    def baixar():
+        resultado = {}
+        if not wolf.baixar_video(url, 'mp4', 'best', resultado=resultado):
+            raise RuntimeError(f"download falhou: {url}")
+        resultados.append(resultado)
+    tempos, _ = medir(baixar, args.repeticoes, limpar_estado)
+    return resumo(tempos, resultados[-1].get('bytes'))
+
+def bench_progressivo(args, base_url):
+    return _bench_download(f"{base_url}/video.mp4", args)
+
+def bench_dash(args, base_url):
+    return _bench_download(f"{base_url}/dash/manifest.mpd", args)
+
+def bench_hls(args, base_url):
+    return _bench_download(f"{base_url}/hls/index.m3u8", args)
+
+def bench_lote(args, base_url):
+    # Mesmo motor de baixar_multiplas_urls, sem os prompts interativos
+    urls = [f"{base_url}/lote_{i:02d}.mp4" for i in range(1, args.lote + 1)]
+
+    def lote():
+        resultados = wolf.executar_lote(urls, 'mp4', 'best', None, args.workers)
+        if not all(r.get('sucesso') for r in resultados):
+            raise RuntimeError("houve falhas no lote")
+        return sum(r.get('bytes', 0) for r in resultados)
+    tempos, total_bytes = medir(lote, args.repeticoes, limpar_estado)
+    return resumo(tempos, total_bytes, urls=len(urls), workers=args.workers)
+
+def bench_audio(args, base_url):
+    conversoes = []
+
+    def converter():
+        resultado = {}
+        if not wolf.baixar_audio(f"{base_url}/video.mp4", ['1', '3', '5'], resultado=resultado).result():
+            raise RuntimeError("conversão falhou")
+        conversoes.append(resultado['metricas']['fases'].get('conversao_audio', 0))
+    tempos, _ = medir(converter, args.repeticoes, limpar_estado)
+    return resumo(tempos, conversao=round(statistics.median(conversoes), 4), formatos=3)
+
+def ultimo_registro(arquivo, motor, duracao_midia):
+    """Última execução comparável: mesmo motor e mesma mídia (None se não houver)"""
+    anterior = None
+    try:
+        with open(arquivo) as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue
+                if registro.get('motor') == motor and registro.get('duracao_midia') == duracao_midia:
+                    anterior = registro
+    except OSError:
+        pass
+    return anterior
+
+def comparar(atual, anterior, limiar):
+    """Mostra a variação da mediana de cada benchmark; devolve quantas regressões houve"""
+    print(f"\n\033[1;36m{'benchmark':<14}{'mediana':>10}{'anterior':>10}{'variação':>10}  vazão\033[0m")
+    regressoes = 0
+    for nome, registro in atual['resultados'].items():
+        antes = ((anterior or {}).get('resultados') or {}).get(nome)
+        vazao = f"  {wolf.formatar_bytes(registro['vazao'])}/s" if registro.get('vazao') else ""
+        if not antes:
+            print(f"{nome:<14}{registro['mediana']:>9.3f}s{'-':>10}{'-':>10}{vazao}")
+            continue
+        variacao = (registro['mediana'] - antes['mediana']) * 100 / antes['mediana'] if antes['mediana'] else 0
+        cor = "\033[1;31m" if variacao > limiar else "\033[1;32m" if variacao < -limiar else ""
+        regressoes += variacao > limiar
+        print(f"{cor}{nome:<14}{registro['mediana']:>9.3f}s{antes['mediana']:>9.3f}s{variacao:>+9.1f}%{vazao}\033[0m")
+    return regressoes
+
+def commit_atual():
+    processo = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA_REPOSITORIO,
+                              capture_output=True, text=True)
+    return processo.stdout.strip() or None
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="benchmark.py",
+                                     description="Benchmarks do Wolf com servidor de mídia local")
+    parser.add_argument('-n', '--repeticoes', type=int, default=3, help="repetições por benchmark (mediana)")
+    parser.add_argument('--so', help=f"benchmarks a rodar, separados por vírgula ({', '.join(BENCHMARKS)})")
+    parser.add_argument('--duracao', type=int, default=20, help="duração da mídia sintética em segundos")
+    parser.add_argument('--lote', type=int, default=6, help="URLs no benchmark de lote")
+    parser.add_argument('-w', '--workers', type=int, default=wolf.MAX_DOWNLOADS_SIMULTANEOS,
+                        help="downloads simultâneos no benchmark de lote")
+    parser.add_argument('--subprocesso', action='store_true', help="usa o yt-dlp em subprocesso em vez da API")
+    parser.add_argument('--resultados', default=ARQUIVO_RESULTADOS, help="arquivo JSONL dos resultados")
+    parser.add_argument('--limiar', type=float, default=LIMIAR_REGRESSAO,
+                        help="piora percentual da mediana considerada regressão")
+    parser.add_argument('--nao-salvar', action='store_true', help="só compara, sem gravar esta execução")
+    parser.add_argument('--manter', action='store_true', help="mantém a pasta temporária do benchmark")
+    return parser
+
+def main():
+    args = criar_parser().parse_args()
+    selecionados = args.so.split(',') if args.so else BENCHMARKS
+    desconhecidos = [nome for nome in selecionados if nome not in BENCHMARKS]
+    if desconhecidos:
+        print(f"\033[1;31m[!] Benchmark desconhecido: {', '.join(desconhecidos)}\033[0m")
+        return 2
+    if args.subprocesso:
+        wolf.USAR_MOTOR_INTERNO = False
+
+    pasta = tempfile.mkdtemp(prefix="wolf_benchmark_")
+    try:
+        print("\033[1;34m[•] Gerando mídia sintética...\033[0m")
+        disponiveis = gerar_midia(os.path.join(pasta, "midia"), args.duracao, args.lote)
+        servidor, base_url = iniciar_servidor(os.path.join(pasta, "midia"))
+        isolar(pasta, base_url)
+        print(f"\033[1;32m[✓] Servidor de mídia em {base_url}\033[0m")
+
+        registro = {
+            'data': time(),
+            'commit': commit_atual(),
+            'motor': 'subprocesso' if args.subprocesso or not wolf.motor_disponivel() else 'api',
+            'yt_dlp': wolf.versao_yt_dlp(),
+            'python': sys.version.split()[0],
+            'repeticoes': args.repeticoes,
+            'duracao_midia': args.duracao,
+            'resultados': {},
+        }
+        for nome in selecionados:
+            if nome in ('progressivo', 'dash', 'hls', 'audio') and nome not in disponiveis:
+                continue
+            print(f"\033[1;34m[•] {nome}...\033[0m")
+            try:
+                registro['resultados'][nome] = globals()[f"bench_{nome}"](args, base_url)
+            except Exception as e:
+                print(f"\033[1;31m[!] {nome} falhou: {e}\033[0m")
+        servidor.shutdown()
+    finally:
+        if args.manter:
+            print(f"\033[1;33m[•] Pasta do benchmark mantida: {pasta}\033[0m")
+        else:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    regressoes = comparar(registro, ultimo_registro(args.resultados, registro['motor'], args.duracao), args.limiar)
+    if not args.nao_salvar:
+        os.makedirs(os.path.dirname(os.path.abspath(args.resultados)), exist_ok=True)
+        with open(args.resultados, 'a') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        print(f"\n\033[1;32m[✓] Resultados gravados em {args.resultados}\033[0m")
+    if regressoes:
+        print(f"\033[1;31m[!] {regressoes} benchmark(s) acima do limiar de {args.limiar:.0f}%\033[0m")
+    return 1 if regressoes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
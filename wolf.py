@@ -4,7 +4,28 @@ import sys
 import subprocess
 import requests
 import shutil
-from time import sleep
+import threading
+import tempfile
+import shlex
+import importlib
+import json
+import re
+import hashlib
+import importlib.metadata
+import sqlite3
+import stat
+import argparse
+import functools
+import collections
+import random
+import queue
+import secrets
+import signal
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from time import sleep, time
+from datetime import datetime
 
 # Configurações (ajustadas para Termux com SDCard)
 HOME = os.path.expanduser("~")
@@ -13,29 +34,136 @@ USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTM
 ARQUIVO_COOKIES = "/sdcard/cookies.txt"
 URL_ATUALIZACAO_COOKIES = "https://jottap-termux.github.io/cookies.txt"
 ATUALIZAR_COOKIES_AUTO = True
+ATUALIZAR_COOKIES_SEGUNDO_PLANO = True
+INTERVALO_COOKIES = 6 * 3600
 TERMUX_PATH = "/data/data/com.termux/files/home/.local/bin"
+PASTA_WOLF = os.path.join(HOME, ".wolf")
+PASTA_LOGS = os.path.join(PASTA_WOLF, "logs")
+PASTA_CACHE = os.path.join(PASTA_WOLF, "cache")
+PASTA_FONTES = os.path.join(PASTA_WOLF, "fontes")
+PASTA_TRABALHO = os.path.join(PASTA_WOLF, "trabalho")
+ARQUIVO_AMBIENTE = os.path.join(PASTA_WOLF, "ambiente.json")
+ARQUIVO_BANCO = os.path.join(PASTA_WOLF, "wolf.db")
+ARQUIVO_METRICAS = os.path.join(PASTA_WOLF, "metricas.jsonl")
+ARQUIVO_DAEMON = os.path.join(PASTA_WOLF, "daemon.json")
+ARQUIVO_DISPOSITIVO = os.path.join(PASTA_WOLF, "dispositivo.json")
+# Anotação oculta em cada pasta de destino com a URL de origem dos arquivos baixados
+ARQUIVO_ORIGENS = ".wolf_origens.jsonl"
+
+# Inicialização rápida: reinstalação completa só quando o ambiente mudar
+INTERVALO_ATUALIZACAO = 7 * 24 * 3600
+VERBOSO = '-v' in sys.argv or '--verbose' in sys.argv
+MODO_INTERATIVO = True
+
+# Cache de metadados (info JSON do yt-dlp)
+CACHE_VALIDADE = 30 * 60
+CACHE_MAX_ARQUIVOS = 200
+CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Pré-extração nos lotes: metadados dos próximos itens resolvidos enquanto os atuais baixam
+PREFETCH_ITENS = 3
+PREFETCH_WORKERS = 2
+# URLs de mídia assinadas que expiram antes disso são resolvidas de novo antes do download
+MARGEM_EXPIRACAO = 10 * 60
+
+# Usa a API Python do yt-dlp quando disponível (subprocesso fica como fallback)
+USAR_MOTOR_INTERNO = True
+
+# Pasta de trabalho no armazenamento interno: .part, fragmentos e merges ficam nela e
+# só o arquivo final vai para PASTA_DOWNLOADS (o /sdcard é FUSE e lento para isso)
+USAR_PASTA_TRABALHO = True
+ESPACO_RESERVA = 50 * 1024 * 1024
+IDADE_TEMPORARIOS_ORFAOS = 3600
+
+# Duplicados por conteúdo: 'link' (hardlink; remove a cópia se o sistema de arquivos não aceitar),
+# 'remover' ou 'desativado'
+DEDUPLICACAO = 'link'
+ACOES_DEDUPLICACAO = ['link', 'remover', 'desativado']
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+# Trechos: True força keyframes nos pontos de corte (recodifica as pontas); False corta sem recodificar
+CORTE_PRECISO = False
+
+# Downloads simultâneos no modo múltiplas URLs
+MAX_DOWNLOADS_SIMULTANEOS = 3
+MAX_POR_HOST = 2
+
+# Conversões de áudio (processos ffmpeg) simultâneas; 0 = automático
+MAX_CONVERSOES_SIMULTANEAS = 0
+
+# Ajuste automático ao aparelho: limita downloads, fragmentos, conversões e threads do ffmpeg
+# conforme CPU livre, memória, bateria, temperatura e velocidade do armazenamento
+AJUSTE_AUTOMATICO = True
+INTERVALO_AMOSTRAGEM = 30
+MEMORIA_POR_DOWNLOAD = 150 * 1024 * 1024
+MEMORIA_BAIXA = 512 * 1024 * 1024
+BATERIA_CRITICA = 20
+BATERIA_BAIXA = 50
+TEMPERATURAS_LIMITE = {'bateria': (42, 47), 'cpu': (75, 85)}   # (quente, crítica) em °C
+ESCRITA_LENTA = 15 * 1024 * 1024
+TAMANHO_TESTE_ESCRITA = 8 * 1024 * 1024
+
+# Playlists/canais: para a expansão após N itens seguidos já sincronizados (0 = nunca)
+PLAYLIST_PARAR_APOS_CONHECIDOS = 0
+
+# Perfis de aceleração (conexões/fragmentos simultâneos por stream)
+PERFIS_ACELERACAO = {
+    'desligado': {'desc': 'Uma conexão por stream', 'params': ''},
+    'termux': {'desc': '4 fragmentos simultâneos, blocos de 10MB',
+               'params': '--concurrent-fragments 4 --http-chunk-size 10M'},
+    'maximo': {'desc': '8 fragmentos simultâneos + aria2c se instalado',
+               'params': '--concurrent-fragments 8 --http-chunk-size 10M', 'aria2c': True},
+}
+PERFIL_ACELERACAO = 'termux'
+
+# Limites de banda em bytes/s (0 = sem limite)
+LIMITE_GLOBAL = 0
+LIMITE_POR_HOST = 0
+LIMITES_DOMINIOS = {}   # ex: {'youtube.com': {'taxa': 1048576, 'conexoes': 1}}
+AGENDA_LIMITES = []     # ex: [{'inicio': '08:00', 'fim': '23:00', 'taxa': 524288}]
+ARQUIVO_CONFIG = os.path.join(PASTA_WOLF, "config.json")
+
+# Modo daemon (API local em 127.0.0.1)
+PORTA_DAEMON = 8765
+MAX_JOBS_HISTORICO = 500   # jobs encerrados mantidos em memória para GET /jobs
 
 # Formatos pré-definidos atualizados
 FORMATOS_VIDEO = {
-    '1': {'desc': '🎯 Best quality (4K if available)', 'code': 'best'},
-    '2': {'desc': '🖥 1080p HD', 'code': '137+140'},
-    '3': {'desc': '💻 720p HD', 'code': '22'},
-    '4': {'desc': '📱 480p', 'code': '135+140'},
-    '5': {'desc': '📼 360p', 'code': '18'}
+    '1': {'desc': '🎯 Best quality (4K if available)', 'code': 'best', 'altura': None, 'aceleracao': 'maximo'},
+    '2': {'desc': '🖥 1080p HD', 'code': '1080p', 'altura': 1080},
+    '3': {'desc': '💻 720p HD', 'code': '720p', 'altura': 720},
+    '4': {'desc': '📱 480p', 'code': '480p', 'altura': 480},
+    '5': {'desc': '📼 360p', 'code': '360p', 'altura': 360}
 }
 
+# Itags do YouTube usados como código de qualidade até o seletor de formatos
+CODIGOS_LEGADOS = {'137+140': '1080p', '22': '720p', '135+140': '480p', '18': '360p'}
+
+# Preferência do seletor de formatos (primeiro = melhor) para saída mp4 sem recodificação
+PREFERENCIA_VCODEC = ('avc1', 'h264', 'vp09', 'vp9', 'av01')
+PREFERENCIA_ACODEC = ('mp4a', 'aac', 'opus', 'vorbis')
+
+# 'ffmpeg'/'muxer'/'ext' descrevem a conversão feita no estágio de conversão;
+# 'copia' é o codec de origem que dispensa recodificação
 FORMATOS_AUDIO = {
-    '1': {'desc': '🎧 MP3 (High quality 320kbps)', 'code': 'mp3', 'params': '-x --audio-format mp3 --audio-quality 0'},
-    '2': {'desc': '🎵 AAC (High quality)', 'code': 'aac', 'params': '-x --audio-format aac'},
-    '3': {'desc': '🎼 FLAC (Lossless)', 'code': 'flac', 'params': '-x --audio-format flac'},
-    '4': {'desc': '🎤 M4A (YouTube default)', 'code': 'm4a', 'params': '-x --audio-format m4a'},
-    '5': {'desc': '🎶 OPUS (Efficient)', 'code': 'opus', 'params': '-x --audio-format opus'},
-    '6': {'desc': '💿 MP3 with cover art', 'code': 'mp3', 'params': '-x --audio-format mp3 --audio-quality 0 --embed-thumbnail --add-metadata'}
+    '1': {'desc': '🎧 MP3 (High quality 320kbps)', 'code': 'mp3', 'params': '-x --audio-format mp3 --audio-quality 0',
+          'ffmpeg': '-c:a libmp3lame -q:a 0', 'muxer': 'mp3', 'ext': 'mp3'},
+    '2': {'desc': '🎵 AAC (High quality)', 'code': 'aac', 'params': '-x --audio-format aac',
+          'ffmpeg': '-c:a aac -b:a 192k', 'muxer': 'adts', 'ext': 'aac', 'copia': 'aac'},
+    '3': {'desc': '🎼 FLAC (Lossless)', 'code': 'flac', 'params': '-x --audio-format flac',
+          'ffmpeg': '-c:a flac', 'muxer': 'flac', 'ext': 'flac'},
+    '4': {'desc': '🎤 M4A (YouTube default)', 'code': 'm4a', 'params': '-x --audio-format m4a',
+          'ffmpeg': '-c:a aac -b:a 192k', 'muxer': 'ipod', 'ext': 'm4a', 'copia': 'aac'},
+    '5': {'desc': '🎶 OPUS (Efficient)', 'code': 'opus', 'params': '-x --audio-format opus',
+          'ffmpeg': '-c:a libopus -b:a 128k', 'muxer': 'opus', 'ext': 'opus', 'copia': 'opus'},
+    '6': {'desc': '💿 MP3 with cover art', 'code': 'mp3', 'params': '-x --audio-format mp3 --audio-quality 0 --embed-thumbnail --add-metadata',
+          'ffmpeg': '-c:a libmp3lame -q:a 0 -id3v2_version 3', 'muxer': 'mp3', 'ext': 'mp3', 'capa': True}
 }
 
 def verificar_e_configurar_ambiente():
     """Verifica e configura todo o ambiente necessário"""
     print("\033[1;34m[•] Configurando ambiente...\033[0m")
+    inicio = time()
 
     # Verifica se está no Termux
     is_termux = 'com.termux' in HOME
@@ -47,17 +175,110 @@ def verificar_e_configurar_ambiente():
     # Cria pasta de downloads
     os.makedirs(PASTA_DOWNLOADS, exist_ok=True)
     print(f"\033[1;32m[✓] Pasta de downloads: {PASTA_DOWNLOADS}\033[0m")
+    removidos, liberados = limpar_temporarios()
+    if removidos:
+        print(f"\033[1;32m[✓] {removidos} temporário(s) abandonado(s) removido(s) ({formatar_bytes(liberados)})\033[0m")
 
-    # Instala dependências
-    if not instalar_dependencias_auto():
-        sys.exit(1)
+    # Partida rápida: só sondagens baratas quando o ambiente já foi configurado
+    impressao = carregar_impressao_ambiente()
+    if impressao and ambiente_inalterado(impressao):
+        print(f"\033[1;32m[✓] Ambiente verificado (yt-dlp {impressao['yt_dlp']})\033[0m")
+        if time() - impressao.get('atualizado_em', 0) > INTERVALO_ATUALIZACAO:
+            atualizar_antes_de_carregar()
+    else:
+        # Instala dependências
+        if not instalar_dependencias_auto():
+            sys.exit(1)
+        salvar_impressao_ambiente(atualizado=True)
 
     # Configura cookies
     criar_cookies()
 
     # Atualiza cookies se necessário
     if ATUALIZAR_COOKIES_AUTO:
-        atualizar_cookies()
+        if ATUALIZAR_COOKIES_SEGUNDO_PLANO:
+            atualizar_cookies_em_segundo_plano()
+        else:
+            atualizar_cookies()
+
+    if VERBOSO:
+        print(f"\033[1;36m[•] Ambiente pronto em {time() - inicio:.2f}s\033[0m")
+
+def versao_yt_dlp():
+    """Versão instalada do yt-dlp sem importar o módulo (None se ausente)"""
+    try:
+        return importlib.metadata.version("yt-dlp")
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    if shutil.which("yt-dlp"):
+        resultado = subprocess.run(["yt-dlp", "--version"], capture_output=True, text=True)
+        if resultado.returncode == 0:
+            return resultado.stdout.strip()
+    return None
+
+def impressao_ambiente():
+    """Coleta a impressão digital atual do ambiente"""
+    return {
+        'python': sys.version.split()[0],
+        'executavel': sys.executable,
+        'yt_dlp': versao_yt_dlp(),
+        'yt_dlp_caminho': shutil.which("yt-dlp"),
+        'ffmpeg': shutil.which("ffmpeg"),
+    }
+
+def carregar_impressao_ambiente():
+    """Lê a impressão digital salva na última configuração completa"""
+    try:
+        with open(ARQUIVO_AMBIENTE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def salvar_impressao_ambiente(atualizado=False):
+    """Grava a impressão digital atual do ambiente"""
+    impressao = impressao_ambiente()
+    anterior = carregar_impressao_ambiente() or {}
+    impressao['verificado_em'] = time()
+    impressao['atualizado_em'] = time() if atualizado else anterior.get('atualizado_em', 0)
+    try:
+        os.makedirs(PASTA_WOLF, exist_ok=True)
+        fd, temporario = tempfile.mkstemp(dir=PASTA_WOLF, suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(impressao, f, indent=2)
+        os.replace(temporario, ARQUIVO_AMBIENTE)
+    except OSError as e:
+        print(f"\033[1;33m[•] Não foi possível salvar o estado do ambiente: {e}\033[0m")
+
+def ambiente_inalterado(impressao):
+    """Confere com sondagens baratas se o ambiente salvo continua válido"""
+    if impressao.get('executavel') != sys.executable or impressao.get('python') != sys.version.split()[0]:
+        return False
+    if not impressao.get('yt_dlp') or not impressao.get('ffmpeg'):
+        return False
+    if not os.path.exists(impressao['ffmpeg']):
+        return False
+    if impressao.get('yt_dlp_caminho') and not os.path.exists(impressao['yt_dlp_caminho']):
+        return False
+    return versao_yt_dlp() == impressao['yt_dlp']
+
+def comando_pip_atualizacao():
+    """pip install --upgrade do yt-dlp/requests com as mesmas opções da instalação"""
+    comando = [sys.executable, "-m", "pip", "install"]
+    if 'com.termux' in HOME:
+        comando.append("--user")
+    return comando + ["--upgrade", "yt-dlp", "requests"]
+
+def atualizar_antes_de_carregar():
+    """Atualiza yt-dlp/requests antes de o yt_dlp ser importado: trocar o pacote com o módulo
+    já carregado misturaria extratores e pós-processadores de versões diferentes"""
+    if 'yt_dlp' in sys.modules:
+        return
+    print("\033[1;33m[•] Atualizando ferramentas (verificação semanal)...\033[0m")
+    resultado = subprocess.run(comando_pip_atualizacao(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if resultado.returncode == 0:
+        salvar_impressao_ambiente(atualizado=True)
+    else:
+        print("\033[1;33m[•] Não foi possível atualizar agora; nova tentativa no próximo início\033[0m")
 
 def configurar_path_termux():
     """Configura o PATH para incluir binários do pip no Termux"""
@@ -108,7 +329,7 @@ def instalar_dependencias_auto():
                 subprocess.run(["pkg", "install", "-y", "python-pip"], check=True)
 
             # Instala yt-dlp e requests
-            subprocess.run([sys.executable, "-m", "pip", "install", "--user", "--upgrade", "yt-dlp", "requests"], check=True)
+            subprocess.run(comando_pip_atualizacao(), check=True)
 
             # Garante que o yt-dlp está acessível
             if not shutil.which("yt-dlp"):
@@ -122,7 +343,7 @@ def instalar_dependencias_auto():
             subprocess.run(["sudo", "apt", "update", "-y"], check=True)
             subprocess.run(["sudo", "apt", "upgrade", "-y"], check=True)
             subprocess.run(["sudo", "apt", "install", "-y", "python3", "python3-pip", "ffmpeg", "wget"], check=True)
-            subprocess.run([sys.executable, "-m", "pip", "install", "--upgrade", "yt-dlp", "requests"], check=True)
+            subprocess.run(comando_pip_atualizacao(), check=True)
 
         print("\033[1;32m[✓] Dependências instaladas/atualizadas!\033[0m")
 
@@ -144,6 +365,12 @@ def instalar_dependencias_auto():
 def verificar_yt_dlp():
     """Verifica se o yt-dlp está instalado e acessível"""
     try:
+        yt_dlp = carregar_yt_dlp()
+        if yt_dlp is not None:
+            versao = importlib.import_module("yt_dlp.version").__version__
+            print(f"\033[1;32m[✓] yt-dlp versão {versao} instalado (motor interno)\033[0m")
+            return True
+
         # Verifica se o comando existe
         if not shutil.which("yt-dlp"):
             # Tenta encontrar o caminho manualmente no Termux
@@ -162,6 +389,1318 @@ def verificar_yt_dlp():
     except Exception:
         return False
 
+class FalhaDownload(Exception):
+    """Erro devolvido pelo motor interno do yt-dlp"""
+
+# Instâncias YoutubeDL guardadas por thread e opções interpretadas guardadas no total (LRU)
+MOTORES_POR_THREAD = 8
+OPCOES_MOTOR_MAXIMO = 64
+
+_motor_lock = threading.Lock()
+_motor_opcoes = collections.OrderedDict()
+_motor_geracao = 0
+_motores = threading.local()
+_local = threading.local()
+_cancelamento = threading.Event()
+_jobs_cancelados = set()   # ids da fila cancelados individualmente (modo daemon)
+
+class ContextoJob:
+    """Estado do job em andamento numa thread (visto também pelas threads de fragmentos)"""
+
+    def __init__(self):
+        self.saida = None
+        self.resultado = None
+        self.metricas = None
+        self.dominio = None
+        self.ultimo_progresso = 0
+        self.ultimo_erro = None
+        self.linha_progresso = False
+        self.baixados = {}
+        self.lock = threading.Lock()
+
+def job_cancelado(resultado=None):
+    """Indica se o lote inteiro ou o job do resultado foi cancelado"""
+    return _cancelamento.is_set() or (resultado is not None and resultado.get('job_id') in _jobs_cancelados)
+
+def contexto():
+    """Contexto do job da thread atual"""
+    ctx = getattr(_local, 'contexto', None)
+    if ctx is None:
+        ctx = _local.contexto = ContextoJob()
+    return ctx
+
+def carregar_yt_dlp():
+    """Importa o módulo yt_dlp se estiver instalado (None caso contrário)"""
+    if not USAR_MOTOR_INTERNO:
+        return None
+    try:
+        return importlib.import_module("yt_dlp")
+    except ImportError:
+        importlib.invalidate_caches()
+        return None
+
+def motor_disponivel():
+    """Indica se o motor interno (API do yt-dlp) pode ser usado"""
+    return carregar_yt_dlp() is not None
+
+def reiniciar_motores():
+    """Descarta as instâncias YoutubeDL (ex: após atualizar cookies)"""
+    global _motor_geracao
+    with _motor_lock:
+        _motor_geracao += 1
+        _motor_opcoes.clear()
+
+def _interpretar_argumentos(argumentos):
+    yt_dlp = carregar_yt_dlp()
+    try:
+        return yt_dlp.parse_options(list(argumentos)).ydl_opts
+    except SystemExit:
+        raise FalhaDownload(f"Argumentos inválidos para o yt-dlp: {' '.join(argumentos)}")
+
+def _opcoes_motor(argumentos):
+    """Converte argumentos de linha de comando em opções do YoutubeDL"""
+    with _motor_lock:
+        if argumentos not in _motor_opcoes:
+            opcoes = _interpretar_argumentos(argumentos)
+            opcoes['noprogress'] = True
+            _motor_opcoes[argumentos] = opcoes
+            if len(_motor_opcoes) > OPCOES_MOTOR_MAXIMO:
+                _motor_opcoes.popitem(last=False)
+        _motor_opcoes.move_to_end(argumentos)
+        return _motor_opcoes[argumentos], _motor_geracao
+
+def obter_motor(opcoes_cli):
+    """Devolve a instância YoutubeDL da thread atual para essas opções (formato e trechos inclusos,
+    pois o YoutubeDL só monta o seletor de formatos no construtor). As instâncias ficam num LRU de
+    MOTORES_POR_THREAD; uma que já relatou erro é recriada, já que o código de retorno não volta a zero."""
+    argumentos = tuple(shlex.split(opcoes_cli))
+    if argumentos and argumentos[0] == 'yt-dlp':
+        argumentos = argumentos[1:]
+    opcoes, geracao = _opcoes_motor(argumentos)
+
+    cache = getattr(_motores, 'cache', None)
+    if cache is None or getattr(_motores, 'geracao', None) != geracao:
+        cache = _motores.cache = collections.OrderedDict()
+        _motores.geracao = geracao
+    ydl = cache.get(argumentos)
+    if ydl is None or ydl.params['logger'].falhou:
+        # Os hooks recebem o contexto da thread dona da instância, pois o yt-dlp
+        # também os chama das threads de fragmentos simultâneos
+        ctx = contexto()
+        opcoes = dict(opcoes,
+                      logger=_LoggerMotor(ctx),
+                      progress_hooks=[functools.partial(_hook_progresso, ctx)],
+                      post_hooks=[functools.partial(_hook_final, ctx)],
+                      postprocessor_hooks=[functools.partial(_hook_pos_processamento, ctx)])
+        ydl = cache[argumentos] = carregar_yt_dlp().YoutubeDL(opcoes)
+        if len(cache) > MOTORES_POR_THREAD:
+            cache.popitem(last=False)
+    cache.move_to_end(argumentos)
+    return ydl
+
+class _LoggerMotor:
+    """Encaminha as mensagens do yt-dlp para o terminal ou log do job atual"""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.falhou = False
+
+    def debug(self, msg):
+        if not msg.startswith('[debug] '):
+            self.info(msg)
+
+    def info(self, msg):
+        _encerrar_linha_progresso(self.ctx)
+        registrar(msg, self.ctx.saida)
+
+    def warning(self, msg):
+        _encerrar_linha_progresso(self.ctx)
+        registrar(f"\033[1;33mWARNING: {msg}\033[0m", self.ctx.saida)
+
+    def error(self, msg):
+        _encerrar_linha_progresso(self.ctx)
+        self.falhou = True
+        self.ctx.ultimo_erro = msg
+        registrar(f"\033[1;31m{msg}\033[0m", self.ctx.saida)
+
+def _encerrar_linha_progresso(ctx):
+    """Quebra a linha de progresso do terminal antes de outra mensagem"""
+    if ctx.linha_progresso:
+        ctx.linha_progresso = False
+        sys.stdout.write("\n")
+
+def _hook_progresso(ctx, d):
+    """Mostra o progresso do download de forma resumida"""
+    saida = ctx.saida
+    resultado = ctx.resultado
+    if job_cancelado(resultado):
+        raise FalhaDownload("Download cancelado")
+    if resultado is not None and d.get('tmpfilename') and resultado.get('parcial') != d['tmpfilename']:
+        # Guarda o arquivo parcial para retomar o job após uma interrupção
+        resultado['parcial'] = d['tmpfilename']
+        if resultado.get('job_id'):
+            atualizar_job(resultado['job_id'], arquivo_parcial=d['tmpfilename'])
+    if ctx.metricas is not None:
+        with ctx.lock:
+            ctx.metricas.progresso(d)
+    if resultado is not None and resultado.get('ao_progresso'):
+        resultado['ao_progresso'](d)
+    if d['status'] == 'downloading':
+        regular_banda(ctx, d)
+        agora = time()
+        if agora - ctx.ultimo_progresso < (1 if saida is None else 10):
+            return
+        ctx.ultimo_progresso = agora
+        baixado = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        velocidade = d.get('speed') or 0
+        porcentagem = f"{baixado * 100 / total:5.1f}%" if total else "  ?  "
+        linha = f"[•] {porcentagem} de {formatar_bytes(total or baixado)} a {formatar_bytes(velocidade)}/s"
+        if saida is None:
+            sys.stdout.write(f"\r\033[1;34m{linha}\033[0m\033[K")
+            sys.stdout.flush()
+            ctx.linha_progresso = True
+        else:
+            registrar(linha, saida)
+
+def _hook_final(ctx, caminho):
+    """Registra o caminho final do arquivo no resultado do job atual (trechos geram vários)"""
+    resultado = ctx.resultado
+    if resultado is not None:
+        resultado['arquivo'] = caminho
+        arquivos = resultado.setdefault('arquivos', [])
+        if caminho not in arquivos:
+            arquivos.append(caminho)
+        resultado['bytes'] = sum(os.path.getsize(arquivo) for arquivo in arquivos if os.path.exists(arquivo))
+
+def _hook_pos_processamento(ctx, d):
+    """Mede o tempo de cada pós-processamento (merge, conversão de áudio...)"""
+    metricas = ctx.metricas
+    if metricas is None:
+        return
+    fase = FASES_POS_PROCESSAMENTO.get(d.get('postprocessor'), 'pos_processamento')
+    if d['status'] == 'started':
+        metricas.iniciar(fase)
+    elif d['status'] == 'finished':
+        metricas.encerrar(fase)
+
+FASES_POS_PROCESSAMENTO = {
+    'Merger': 'merge',
+    'ExtractAudio': 'conversao_audio',
+    'VideoConvertor': 'conversao_video',
+    'VideoRemuxer': 'conversao_video',
+}
+
+NOMES_ESTRATEGIAS = ['cookies', 'extrator_generico', 'simples']
+
+def opcoes_estrategias():
+    """Opções do yt-dlp de cada estratégia de extração, na ordem de NOMES_ESTRATEGIAS"""
+    return dict(zip(NOMES_ESTRATEGIAS, [
+        f'yt-dlp --user-agent "{USER_AGENT}" --cookies "{ARQUIVO_COOKIES}" --no-check-certificate',
+        f'yt-dlp --user-agent "{USER_AGENT}" --cookies "{ARQUIVO_COOKIES}" --force-generic-extractor',
+        'yt-dlp --ignore-errors'
+    ]))
+
+# Classes de falha reconhecidas na mensagem do yt-dlp (vale a primeira que casar)
+CLASSES_FALHA = [
+    ('cancelado', r'Download cancelado'),
+    ('formato', r'Requested format is not available'),
+    ('espaco', r'No space left on device'),
+    ('limite', r'HTTP Error 429|Too Many Requests|rate.?limit'),
+    ('indisponivel', r'Video unavailable|Private video|video is private|has been removed|HTTP Error 4(04|10)|'
+                     r'not available in your country|copyright|members.only|Join this channel|account .*terminated'),
+    ('acesso', r'HTTP Error 40[13]|Forbidden|Sign in to confirm|login required|--cookies'),
+    ('extrator', r'Unsupported URL|Unable to extract|No video formats found'),
+    ('rede', r'timed out|[Tt]imeout|Connection (reset|refused|aborted)|Temporary failure in name resolution|'
+             r'Name or service not known|Network is unreachable|IncompleteRead|Remote end closed|'
+             r'HTTP Error 5\d\d|Unable to download webpage|EOF occurred|fragment .* not found'),
+]
+DESCRICOES_FALHAS = {
+    'cancelado': 'cancelado', 'formato': 'formato indisponível', 'espaco': 'sem espaço',
+    'limite': 'limite de requisições', 'indisponivel': 'vídeo indisponível', 'acesso': 'acesso negado',
+    'extrator': 'extrator', 'rede': 'rede', 'desconhecida': 'desconhecida',
+}
+FALHAS_TRANSITORIAS = {'rede', 'limite'}            # repetem a mesma estratégia com backoff
+FALHAS_DOMINIO = {'rede', 'limite', 'acesso'}       # contam para o disjuntor do domínio
+FALHAS_DEFINITIVAS = {'indisponivel', 'espaco', 'cancelado'}   # nenhuma estratégia resolve
+REPETICOES_TRANSITORIAS = 3
+BACKOFF_BASE = {'rede': 2, 'limite': 15}
+BACKOFF_MAXIMO = 120
+BACKOFF_TOTAL_MAXIMO = 3 * 60   # soma das esperas de um job antes de desistir das repetições
+FALHAS_ABRIR_CIRCUITO = 5
+PAUSA_CIRCUITO = 60
+PAUSA_CIRCUITO_MAXIMA = 15 * 60
+
+def classificar_falha(mensagem):
+    """Classe da falha a partir da mensagem de erro do yt-dlp"""
+    for classe, padrao in CLASSES_FALHA:
+        if re.search(padrao, mensagem or ''):
+            return classe
+    return 'desconhecida'
+
+def espera_backoff(repeticao, classe):
+    """Backoff exponencial com jitter: sorteia entre metade e o total da janela da repetição"""
+    janela = min(BACKOFF_MAXIMO, BACKOFF_BASE.get(classe, 2) * 2 ** repeticao)
+    return random.uniform(janela / 2, janela)
+
+def aguardar(segundos, resultado=None):
+    """Espera interrompível pelo cancelamento do job"""
+    fim = time() + segundos
+    while not job_cancelado(resultado) and time() < fim:
+        sleep(min(0.5, max(0, fim - time())))
+
+class CircuitoDominio:
+    """Disjuntor por domínio: após falhas seguidas de rede ou bloqueio, os jobs do domínio falham
+    de imediato durante uma pausa (que dobra a cada reabertura) em vez de insistir no site"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.falhas = 0
+        self.aberto_ate = 0
+        self.pausa = PAUSA_CIRCUITO
+
+    def bloqueado(self):
+        """Segundos que faltam para liberar o domínio (0 = pode tentar)"""
+        with self.lock:
+            return max(0, self.aberto_ate - time())
+
+    def sucesso(self):
+        with self.lock:
+            self.falhas = 0
+            self.pausa = PAUSA_CIRCUITO
+
+    def falha(self):
+        with self.lock:
+            self.falhas += 1
+            if self.falhas >= FALHAS_ABRIR_CIRCUITO:
+                self.aberto_ate = time() + self.pausa
+                self.pausa = min(self.pausa * 2, PAUSA_CIRCUITO_MAXIMA)
+                # Meio aberto: depois da pausa, uma única falha já reabre o disjuntor
+                self.falhas = FALHAS_ABRIR_CIRCUITO - 1
+
+_circuitos = {}
+_circuitos_lock = threading.Lock()
+
+def circuito_dominio(dominio):
+    with _circuitos_lock:
+        if dominio not in _circuitos:
+            _circuitos[dominio] = CircuitoDominio()
+        return _circuitos[dominio]
+
+def ordem_estrategias(dominio):
+    """Estratégias na ordem de tentativa: a última que funcionou no domínio vem primeiro"""
+    linha = banco().execute("SELECT estrategia FROM estrategias WHERE dominio = ?", (dominio,)).fetchone()
+    if linha and linha[0] in NOMES_ESTRATEGIAS:
+        return [linha[0]] + [nome for nome in NOMES_ESTRATEGIAS if nome != linha[0]]
+    return list(NOMES_ESTRATEGIAS)
+
+def lembrar_estrategia(dominio, nome):
+    """Guarda a estratégia vencedora do domínio para os próximos downloads"""
+    if not dominio:
+        return
+    conexao = banco()
+    conexao.execute(
+        "INSERT INTO estrategias VALUES (?, ?, 1, ?) ON CONFLICT (dominio) DO UPDATE SET "
+        "sucessos = CASE WHEN estrategia = excluded.estrategia THEN sucessos + 1 ELSE 1 END, "
+        "estrategia = excluded.estrategia, atualizado_em = excluded.atualizado_em", (dominio, nome, time()))
+    conexao.commit()
+
+def executar_subprocesso(comando, saida=None, resultado=None):
+    """Roda o yt-dlp em subprocesso: o stdout vai ao terminal/log como antes e o stderr é repassado
+    e guardado para classificar a falha. Encerra o processo se o job for cancelado."""
+    # Sem log do job, o stdout do yt-dlp segue o sys.stdout atual (no modo CLI, o stderr):
+    # herdar o fd 1 misturaria o progresso às linhas JSON
+    processo = subprocess.Popen(comando, shell=True, stdout=saida or sys.stdout, stderr=subprocess.PIPE,
+                                text=True, errors='replace')
+    erros = collections.deque(maxlen=50)
+
+    def ler_erros():
+        for linha in processo.stderr:
+            erros.append(linha.rstrip())
+            (saida or sys.stderr).write(linha)
+            (saida or sys.stderr).flush()
+    leitor = threading.Thread(target=ler_erros, daemon=True)
+    leitor.start()
+    while True:
+        try:
+            codigo = processo.wait(timeout=0.5)
+            break
+        except subprocess.TimeoutExpired:
+            if job_cancelado(resultado):
+                processo.terminate()
+    leitor.join()
+    if job_cancelado(resultado):
+        raise FalhaDownload("Download cancelado")
+    if codigo != 0:
+        linhas = [linha for linha in erros if linha.startswith('ERROR')] or list(erros)
+        raise FalhaDownload(linhas[-1] if linhas else f"yt-dlp terminou com código {codigo}")
+
+
+class MetricasJob:
+    """Tempos por fase, bytes e vazão de um job de download"""
+
+    def __init__(self, url, perfil):
+        self.url = url
+        self.perfil = perfil
+        self.inicio = time()
+        self.fases = {}
+        self.bytes = 0
+        self.pico = 0
+        self.tentativas = 0
+        self.falhas = {}
+        self.estrategia = None
+        self.cache = False
+        self.motor = None
+        self._inicios = {}
+        self._arquivos = {}
+
+    def iniciar(self, fase):
+        self._inicios[fase] = time()
+
+    def encerrar(self, fase):
+        inicio = self._inicios.pop(fase, None)
+        if inicio is not None:
+            self.adicionar(fase, time() - inicio)
+
+    def adicionar(self, fase, duracao):
+        self.fases[fase] = self.fases.get(fase, 0) + duracao
+
+    def progresso(self, d):
+        """Atualiza bytes, pico de vazão e tempo de download a partir do hook do yt-dlp"""
+        if d['status'] == 'downloading':
+            if 'download' not in self._inicios:
+                self.iniciar('download')
+            self.pico = max(self.pico, d.get('speed') or 0)
+        elif d['status'] in ('finished', 'error'):
+            self.encerrar('download')
+            if d['status'] == 'finished':
+                # HLS/DASH podem avisar o fim do mesmo arquivo mais de uma vez
+                self._arquivos[d.get('filename')] = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                self.bytes = sum(self._arquivos.values())
+
+    def como_dict(self, sucesso):
+        duracao_download = self.fases.get('download', 0)
+        return {
+            'data': self.inicio,
+            'url': self.url,
+            'perfil': self.perfil,
+            'sucesso': sucesso,
+            'motor': self.motor,
+            'cache_metadados': self.cache,
+            'tentativas': self.tentativas,
+            'estrategia': self.estrategia,
+            'falhas': self.falhas,
+            'duracao_total': round(time() - self.inicio, 3),
+            'fases': {fase: round(duracao, 3) for fase, duracao in self.fases.items()},
+            'bytes': self.bytes,
+            'vazao_media': round(self.bytes / duracao_download) if duracao_download > 0 else 0,
+            'vazao_pico': round(self.pico),
+        }
+
+_metricas_sessao = []
+_metricas_lock = threading.Lock()
+
+def registrar_metricas(metricas, sucesso):
+    """Grava as métricas do job no JSONL e na lista da sessão"""
+    registro = metricas.como_dict(sucesso)
+    with _metricas_lock:
+        _metricas_sessao.append(registro)
+        try:
+            os.makedirs(os.path.dirname(ARQUIVO_METRICAS), exist_ok=True)
+            with open(ARQUIVO_METRICAS, 'a') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+    return registro
+
+def mostrar_resumo_metricas(registros=None, titulo="MÉTRICAS DA SESSÃO"):
+    """Resume onde o tempo foi gasto (por fase), vazão e estratégias vencedoras"""
+    registros = _metricas_sessao if registros is None else registros
+    registros = [r for r in registros if r]
+    if not registros:
+        return
+
+    fases = {}
+    for r in registros:
+        for fase, duracao in r['fases'].items():
+            fases[fase] = fases.get(fase, 0) + duracao
+    total_fases = sum(fases.values()) or 1
+    total_bytes = sum(r['bytes'] for r in registros)
+    tempo_download = fases.get('download', 0)
+    estrategias = {}
+    for r in registros:
+        if r['estrategia']:
+            estrategias[r['estrategia']] = estrategias.get(r['estrategia'], 0) + 1
+
+    print(f"\n\033[1;36m[•] {titulo}: {len(registros)} job(s), "
+          f"{sum(1 for r in registros if r['sucesso'])} com sucesso, "
+          f"{sum(1 for r in registros if r['cache_metadados'])} com metadados em cache\033[0m")
+    for fase, duracao in sorted(fases.items(), key=lambda item: -item[1]):
+        print(f"\033[1;34m    • {fase:<18} {duracao:8.1f}s ({duracao * 100 / total_fases:4.1f}%)\033[0m")
+    if tempo_download > 0:
+        print(f"\033[1;34m    • vazão média {formatar_bytes(total_bytes / tempo_download)}/s, "
+              f"pico {formatar_bytes(max(r['vazao_pico'] for r in registros))}/s\033[0m")
+    if estrategias:
+        resumo = ", ".join(f"{nome}: {qtd}" for nome, qtd in estrategias.items())
+        print(f"\033[1;34m    • estratégias vencedoras: {resumo}; "
+              f"média de {sum(r['tentativas'] for r in registros) / len(registros):.1f} tentativa(s)\033[0m")
+    falhas = {}
+    for r in registros:
+        for classe, qtd in r.get('falhas', {}).items():
+            falhas[classe] = falhas.get(classe, 0) + qtd
+    if falhas:
+        resumo = ", ".join(f"{DESCRICOES_FALHAS.get(classe, classe)}: {qtd}" for classe, qtd in falhas.items())
+        print(f"\033[1;34m    • falhas por classe: {resumo}\033[0m")
+
+def executar_motor(opcoes_cli, link, saida=None, resultado=None, info_arquivo=None):
+    """Baixa o link com o motor interno, lançando FalhaDownload em caso de erro"""
+    ctx = contexto()
+    ctx.saida = saida
+    ctx.resultado = resultado
+    ctx.ultimo_progresso = 0
+    ctx.ultimo_erro = None
+    ctx.baixados = {}
+    try:
+        ydl = obter_motor(opcoes_cli)
+        if info_arquivo:
+            codigo = ydl.download_with_info_file(info_arquivo)
+        else:
+            codigo = ydl.download([link])
+    except carregar_yt_dlp().utils.DownloadError as e:
+        raise FalhaDownload(str(e))
+    finally:
+        ctx.saida = None
+        ctx.resultado = None
+    if codigo != 0:
+        raise FalhaDownload(ctx.ultimo_erro or f"yt-dlp terminou com código {codigo}")
+    return True
+
+def listar_formatos_motor(opcoes_cli, info_arquivo):
+    """Lista os formatos de um info JSON usando o motor interno"""
+    with open(info_arquivo) as f:
+        info = json.load(f)
+    obter_motor(opcoes_cli).list_formats(info)
+
+# Parâmetros de rastreio: nomes exatos, e só utm_ por prefixo (sid, size, signature... identificam o vídeo)
+PARAMETROS_RASTREIO = {'fbclid', 'gclid', 'si', 'feature', 'igshid'}
+PREFIXOS_RASTREIO = ('utm_',)
+REGEX_YOUTUBE = re.compile(r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([\w-]{11})')
+REGEX_PLAYLIST = re.compile(r'youtube\.com/(?:playlist\?|@|channel/|c/|user/|watch\?(?:.*&)?list=)')
+
+def normalizar_url(url):
+    """Normaliza a URL removendo fragmentos e parâmetros de rastreio"""
+    partes = urlparse(url.strip())
+    host = partes.netloc.lower()
+    for prefixo in ('www.', 'm.'):
+        if host.startswith(prefixo):
+            host = host[len(prefixo):]
+    query = sorted((k, v) for k, v in parse_qsl(partes.query, keep_blank_values=True)
+                   if k not in PARAMETROS_RASTREIO and not k.startswith(PREFIXOS_RASTREIO))
+    return urlunparse((partes.scheme.lower(), host, partes.path.rstrip('/') or '/', '', urlencode(query), ''))
+
+def chave_video(url):
+    """Identifica o vídeo pela URL (id do YouTube ou URL normalizada)"""
+    encontrado = REGEX_YOUTUBE.search(url)
+    if encontrado:
+        return f"youtube:{encontrado.group(1)}"
+    return f"url:{normalizar_url(url)}"
+
+def caminho_cache(url):
+    """Caminho do info JSON em cache para a URL"""
+    nome = hashlib.sha1(chave_video(url).encode()).hexdigest()
+    return os.path.join(PASTA_CACHE, f"{nome}.info.json")
+
+# Expiração das URLs assinadas (?expire=, &Expires=, /expire/...) dentro do info JSON
+REGEX_EXPIRACAO = re.compile(r'[?&/](?:expire|expires|Expires)[=/](\d{9,11})(?!\d)')
+
+# caminho do info JSON -> (mtime, menor expiração das URLs de mídia ou None)
+_expiracoes = {}
+_expiracoes_lock = threading.Lock()
+
+def expiracao_midia(info):
+    """Menor instante de expiração entre as URLs de mídia do info (None se não forem assinadas)"""
+    formatos = (info.get('requested_formats') or []) + (info.get('formats') or []) + [info]
+    instantes = [int(encontrado.group(1)) for formato in formatos
+                 for encontrado in [REGEX_EXPIRACAO.search(formato.get('url') or '')] if encontrado]
+    return min(instantes) if instantes else None
+
+def _lembrar_expiracao(caminho, info=None):
+    """Calcula (lendo o arquivo só se preciso) e guarda a expiração do info em cache"""
+    mtime = os.path.getmtime(caminho)
+    with _expiracoes_lock:
+        registro = _expiracoes.get(caminho)
+    if registro is None or registro[0] != mtime:
+        registro = (mtime, expiracao_midia(info if info is not None else ler_info(caminho)))
+        with _expiracoes_lock:
+            _expiracoes[caminho] = registro
+    return registro[1]
+
+def info_em_cache(url):
+    """Devolve o caminho do info JSON em cache se ainda for válido (metadados recentes e
+    URLs de mídia que não expiram antes de o download terminar)"""
+    caminho = caminho_cache(url)
+    try:
+        if time() - os.path.getmtime(caminho) < CACHE_VALIDADE:
+            expiracao = _lembrar_expiracao(caminho)
+            if expiracao is None or expiracao - time() > MARGEM_EXPIRACAO:
+                return caminho
+    except OSError:
+        pass
+    return None
+
+def salvar_info_cache(url, info):
+    """Grava o info JSON de forma atômica e aplica os limites do cache"""
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    caminho = caminho_cache(url)
+    fd, temporario = tempfile.mkstemp(dir=PASTA_CACHE, suffix=".tmp")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(info, f)
+    os.replace(temporario, caminho)
+    _lembrar_expiracao(caminho, info)
+    podar_cache()
+    return caminho
+
+def podar_cache():
+    """Remove entradas expiradas e as mais antigas além dos limites"""
+    entradas = []
+    for nome in os.listdir(PASTA_CACHE):
+        caminho = os.path.join(PASTA_CACHE, nome)
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            continue
+        if time() - estado.st_mtime > CACHE_VALIDADE:
+            _remover_silencioso(caminho)
+            with _expiracoes_lock:
+                _expiracoes.pop(caminho, None)
+        else:
+            entradas.append((estado.st_mtime, estado.st_size, caminho))
+
+    entradas.sort()
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    while entradas and (len(entradas) > CACHE_MAX_ARQUIVOS or total > CACHE_MAX_BYTES):
+        _, tamanho, caminho = entradas.pop(0)
+        total -= tamanho
+        _remover_silencioso(caminho)
+        with _expiracoes_lock:
+            _expiracoes.pop(caminho, None)
+
+def _remover_silencioso(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+def obter_info(link, opcoes_cli, saida=None, forcar=False):
+    """Extrai (ou lê do cache) os metadados do link e devolve o caminho do info JSON;
+    forcar=True ignora o cache (ex: outra estratégia de extração)"""
+    caminho = None if forcar else info_em_cache(link)
+    if caminho:
+        registrar("\033[1;32m[✓] Metadados carregados do cache\033[0m", saida)
+        return caminho
+
+    registrar("\033[1;34m[•] Extraindo metadados...\033[0m", saida)
+    if motor_disponivel():
+        ctx = contexto()
+        ctx.saida = saida
+        ctx.ultimo_erro = None
+        try:
+            ydl = obter_motor(opcoes_cli)
+            info = ydl.extract_info(link, download=False)
+        except carregar_yt_dlp().utils.DownloadError as e:
+            raise FalhaDownload(str(e))
+        finally:
+            ctx.saida = None
+        if info is None:
+            # O perfil padrão do yt-dlp ignora erros de extração e devolve None
+            raise FalhaDownload(ctx.ultimo_erro or "Falha na extração de metadados")
+        info = ydl.sanitize_info(info)
+    else:
+        processo = subprocess.run(f'{opcoes_cli} -J "{link}"', shell=True, capture_output=True, text=True)
+        if processo.returncode != 0:
+            raise FalhaDownload(processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else
+                                f"yt-dlp terminou com código {processo.returncode}")
+        info = json.loads(processo.stdout)
+    return salvar_info_cache(link, info)
+
+def altura_maxima(qualidade):
+    """Altura máxima (em linhas) de um código de qualidade; None = melhor disponível"""
+    qualidade = CODIGOS_LEGADOS.get(qualidade, qualidade)
+    encontrado = re.fullmatch(r'(\d+)p', qualidade or '')
+    return int(encontrado.group(1)) if encontrado else None
+
+# Nomes que o -f do yt-dlp interpreta como atalho em vez de format_id
+NOMES_RESERVADOS_FORMATO = {'b', 'w', 'best', 'worst', 'bv', 'ba', 'wv', 'wa', 'all', 'mergeall',
+                            '3gp', 'aac', 'flv', 'm4a', 'mp3', 'mp4', 'ogg', 'wav', 'webm'}
+
+def _seletor_id(format_id):
+    """Seleciona exatamente o format_id, mesmo quando ele coincide com um atalho do -f"""
+    if format_id in NOMES_RESERVADOS_FORMATO or not re.fullmatch(r'[\w.-]+', format_id):
+        return f"b*[format_id={format_id}]"
+    return format_id
+
+def _preferencia(codec, ordem):
+    codec = (codec or '').lower()
+    for posicao, prefixo in enumerate(ordem):
+        if codec.startswith(prefixo):
+            return len(ordem) - posicao
+    return 0
+
+def selecionar_formato(info, qualidade=None, container='mp4'):
+    """Escolhe na lista de formatos do info JSON o vídeo mais próximo da qualidade pedida
+    (altura, depois codec e container) e o melhor áudio para juntar a ele.
+    Devolve (especificação -f, descrição) ou None se não houver formatos de vídeo."""
+    limite = altura_maxima(qualidade)
+    formatos = [f for f in info.get('formats') or []
+                if f.get('format_id') and not f.get('has_drm') and f.get('ext') != 'mhtml']
+    videos = [f for f in formatos if f.get('vcodec') != 'none']
+    if not videos:
+        return None
+
+    def nota(f):
+        return (f.get('height') or 0, _preferencia(f.get('vcodec'), PREFERENCIA_VCODEC),
+                f.get('ext') == container, f.get('acodec') != 'none', f.get('fps') or 0, f.get('tbr') or 0)
+
+    dentro = [f for f in videos if limite is None or (f.get('height') or 0) <= limite]
+    if not dentro:
+        # Nada abaixo do limite: fica com a menor altura disponível
+        menor = min(f['height'] for f in videos)
+        dentro = [f for f in videos if f['height'] == menor]
+    video = max(dentro, key=nota)
+    descricao = " ".join(filter(None, [f"{video['height']}p" if video.get('height') else None,
+                                       video.get('vcodec') or video.get('ext')]))
+    if video.get('acodec') != 'none':
+        return _seletor_id(video['format_id']), descricao
+
+    audios = [f for f in formatos if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+    if not audios:
+        return _seletor_id(video['format_id']), descricao
+    audio = max(audios, key=lambda f: (f.get('language_preference') or 0,
+                                       _preferencia(f.get('acodec'), PREFERENCIA_ACODEC),
+                                       f.get('abr') or f.get('tbr') or 0))
+    return f"{_seletor_id(video['format_id'])}+{_seletor_id(audio['format_id'])}", \
+        f"{descricao} + {audio.get('acodec')}"
+
+def formato_flexivel(qualidade=None, container='mp4'):
+    """Seleção delegada à ordenação do yt-dlp, usada quando não há lista de formatos"""
+    limite = altura_maxima(qualidade)
+    resolucao = f"res:{limite}" if limite else "res"
+    return f'-f "bv*+ba/b" -S "{resolucao},vcodec:h264,acodec:aac,ext:{container}:m4a" ' \
+           f'--merge-output-format {container}'
+
+# Formatos de baixar_video que saem só com áudio (sem --merge-output-format)
+FORMATOS_SO_AUDIO = ('audio', 'mp3')
+PARAMETROS_MP3 = '-x --audio-format mp3 --audio-quality 0'
+
+def trocar_formato(params, especificacao=None):
+    """Troca o -f/--format dos parâmetros do yt-dlp (especificacao None = só remove)"""
+    argumentos = shlex.split(params or '')
+    restantes = []
+    posicao = 0
+    while posicao < len(argumentos):
+        if argumentos[posicao] in ('-f', '--format'):
+            posicao += 2
+            continue
+        if not argumentos[posicao].startswith('--format='):
+            restantes.append(argumentos[posicao])
+        posicao += 1
+    if especificacao:
+        restantes = ['-f', especificacao] + restantes
+    return shlex.join(restantes)
+
+def argumentos_formato(info_arquivo, qualidade=None, container='mp4', saida=None):
+    """Parâmetros -f resolvidos contra os formatos realmente disponíveis"""
+    escolha = None
+    if info_arquivo:
+        try:
+            with open(info_arquivo) as f:
+                escolha = selecionar_formato(json.load(f), qualidade, container)
+        except (OSError, ValueError):
+            pass
+    if escolha is None:
+        return formato_flexivel(qualidade, container)
+    especificacao, descricao = escolha
+    registrar(f"\033[1;34m[•] Formato escolhido: {descricao} ({especificacao})\033[0m", saida)
+    return f'-f "{especificacao}" --merge-output-format {container}'
+
+_banco = threading.local()
+
+def banco():
+    """Conexão SQLite da thread atual com o banco local do Wolf"""
+    conexao = getattr(_banco, 'conexao', None)
+    if conexao is None or getattr(_banco, 'caminho', None) != ARQUIVO_BANCO:
+        os.makedirs(os.path.dirname(ARQUIVO_BANCO), exist_ok=True)
+        conexao = sqlite3.connect(ARQUIVO_BANCO, timeout=30)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("""CREATE TABLE IF NOT EXISTS downloads (
+            chave TEXT NOT NULL,
+            perfil TEXT NOT NULL,
+            arquivo TEXT NOT NULL,
+            tamanho INTEGER,
+            baixado_em REAL,
+            url TEXT,
+            PRIMARY KEY (chave, perfil))""")
+        conexao.execute("""CREATE TABLE IF NOT EXISTS fila (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lote TEXT NOT NULL,
+            indice INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            formato TEXT,
+            qualidade TEXT,
+            params_extra TEXT,
+            estado TEXT NOT NULL DEFAULT 'pendente',
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            arquivo_parcial TEXT,
+            arquivo TEXT,
+            atualizado_em REAL,
+            playlist TEXT,
+            trechos TEXT)""")
+        colunas = {coluna[1] for coluna in conexao.execute("PRAGMA table_info(fila)")}
+        for coluna in ('playlist', 'trechos'):
+            if coluna not in colunas:
+                conexao.execute(f"ALTER TABLE fila ADD COLUMN {coluna} TEXT")
+        conexao.execute("CREATE INDEX IF NOT EXISTS fila_lote ON fila (lote, estado)")
+        if conexao.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Qualidades antigas (itags do YouTube) passam a usar os códigos do seletor de formatos
+            for antigo, novo in CODIGOS_LEGADOS.items():
+                conexao.execute("UPDATE OR IGNORE downloads SET perfil = ? WHERE perfil = ?",
+                                (f"mp4:{novo}", f"mp4:{antigo}"))
+                conexao.execute("UPDATE fila SET qualidade = ? WHERE qualidade = ?", (novo, antigo))
+            conexao.execute("PRAGMA user_version = 1")
+        conexao.execute("""CREATE TABLE IF NOT EXISTS conteudo (
+            caminho TEXT PRIMARY KEY,
+            tamanho INTEGER NOT NULL,
+            mtime REAL,
+            hash TEXT)""")
+        conexao.execute("CREATE INDEX IF NOT EXISTS conteudo_tamanho ON conteudo (tamanho)")
+        conexao.execute("""CREATE TABLE IF NOT EXISTS estrategias (
+            dominio TEXT PRIMARY KEY,
+            estrategia TEXT NOT NULL,
+            sucessos INTEGER NOT NULL DEFAULT 0,
+            atualizado_em REAL)""")
+        conexao.execute("""CREATE TABLE IF NOT EXISTS sincronizacao (
+            playlist TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            perfil TEXT NOT NULL,
+            concluido_em REAL,
+            PRIMARY KEY (playlist, chave, perfil))""")
+        conexao.commit()
+        _banco.conexao = conexao
+        _banco.caminho = ARQUIVO_BANCO
+    return conexao
+
+def perfil_download(formato, qualidade=None, params_extra=None, trechos=None):
+    """Identifica o formato escolhido (e os trechos, se houver) para o índice de downloads"""
+    perfil = f"{formato}:{params_extra}" if params_extra else f"{formato}:{qualidade or 'best'}"
+    return f"{perfil}@{trechos}" if trechos else perfil
+
+def chave_info(info_arquivo):
+    """Chave extrator:id a partir do info JSON (None se indisponível)"""
+    try:
+        with open(info_arquivo) as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if info.get('extractor_key') and info.get('id'):
+        return f"{info['extractor_key'].lower()}:{info['id']}"
+    return None
+
+def consultar_indice(chave, perfil, formato):
+    """Devolve o registro do download se o arquivo ainda existir (formato None = só o perfil exato)"""
+    if not chave:
+        return None
+    conexao = banco()
+    for perfil_busca in (perfil, f"*:{formato}") if formato else (perfil,):
+        linha = conexao.execute("SELECT arquivo, tamanho FROM downloads WHERE chave = ? AND perfil = ?",
+                                (chave, perfil_busca)).fetchone()
+        if linha is None:
+            continue
+        arquivo, tamanho = linha
+        if os.path.exists(arquivo) and os.path.getsize(arquivo) == tamanho:
+            return {'arquivo': arquivo, 'tamanho': tamanho}
+        conexao.execute("DELETE FROM downloads WHERE chave = ? AND perfil = ?", (chave, perfil_busca))
+        conexao.commit()
+    return None
+
+def registrar_no_indice(chaves, perfil, arquivo, url):
+    """Registra o arquivo baixado sob todas as chaves conhecidas do vídeo"""
+    if not arquivo or not os.path.exists(arquivo):
+        return
+    tamanho = os.path.getsize(arquivo)
+    conexao = banco()
+    conexao.executemany("INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?)",
+                        [(chave, perfil, arquivo, tamanho, time(), url) for chave in chaves if chave])
+    conexao.commit()
+    registrar_origem(arquivo, url, chaves)
+
+_origens_lock = threading.Lock()
+
+def registrar_origem(arquivo, url, chaves):
+    """Anota a origem do arquivo ao lado dele, para reconstruir o índice mesmo sem o banco"""
+    registro = {'arquivo': os.path.basename(arquivo), 'url': url, 'chaves': [chave for chave in chaves if chave]}
+    with _origens_lock:
+        try:
+            with open(os.path.join(os.path.dirname(arquivo), ARQUIVO_ORIGENS), 'a') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+def origens_da_pasta(pasta):
+    """Nome do arquivo -> (URL, chaves) anotados na pasta (vale o registro mais recente)"""
+    origens = {}
+    try:
+        with open(os.path.join(pasta, ARQUIVO_ORIGENS)) as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                    origens[registro['arquivo']] = (registro['url'], registro.get('chaves') or [])
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except OSError:
+        pass
+    return origens
+
+def compactar_origens(pasta, origens, nomes):
+    """Regrava a anotação da pasta só com os arquivos que ainda existem"""
+    caminho = os.path.join(pasta, ARQUIVO_ORIGENS)
+    with _origens_lock:
+        try:
+            fd, temporario = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                for nome in nomes:
+                    if nome in origens:
+                        url, chaves = origens[nome]
+                        f.write(json.dumps({'arquivo': nome, 'url': url, 'chaves': chaves}, ensure_ascii=False) + "\n")
+            os.replace(temporario, caminho)
+        except OSError:
+            pass
+
+def url_embutida(arquivo):
+    """Lê a URL de origem gravada nos metadados do arquivo (via ffprobe)"""
+    if not shutil.which("ffprobe"):
+        return None
+    resultado = subprocess.run(["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", arquivo],
+                               capture_output=True, text=True)
+    if resultado.returncode != 0:
+        return None
+    try:
+        tags = json.loads(resultado.stdout).get('format', {}).get('tags', {})
+    except ValueError:
+        return None
+    for nome, valor in tags.items():
+        if nome.lower() in ('purl', 'comment', 'description') and str(valor).startswith(('http://', 'https://')):
+            return valor
+    return None
+
+def reconstruir_indice():
+    """Reconstrói o índice de downloads a partir da pasta de downloads"""
+    print(f"\033[1;34m[•] Reconstruindo índice a partir de {PASTA_DOWNLOADS}...\033[0m")
+    conexao = banco()
+    removidos = atualizados = recuperados = 0
+
+    indexados = set()
+    for chave, perfil, arquivo, tamanho in conexao.execute(
+            "SELECT chave, perfil, arquivo, tamanho FROM downloads").fetchall():
+        if not os.path.exists(arquivo):
+            conexao.execute("DELETE FROM downloads WHERE chave = ? AND perfil = ?", (chave, perfil))
+            removidos += 1
+            continue
+        indexados.add(os.path.abspath(arquivo))
+        if os.path.getsize(arquivo) != tamanho:
+            conexao.execute("UPDATE downloads SET tamanho = ? WHERE chave = ? AND perfil = ?",
+                            (os.path.getsize(arquivo), chave, perfil))
+            atualizados += 1
+
+    origens = None
+    sem_origem = pelo_cache = 0
+    for raiz, _, arquivos in os.walk(PASTA_DOWNLOADS):
+        anotadas = origens_da_pasta(raiz)
+        if anotadas:
+            compactar_origens(raiz, anotadas, arquivos)
+        for nome in arquivos:
+            caminho = os.path.abspath(os.path.join(raiz, nome))
+            if caminho in indexados or nome == ARQUIVO_ORIGENS or nome.endswith(('.part', '.ytdl', '.tmp')):
+                continue
+            # A origem anotada no download vale primeiro; depois os metadados do arquivo
+            url, chaves = anotadas.get(nome) or (url_embutida(caminho), [])
+            chaves = list(chaves)
+            if not url:
+                # Arquivos de antes da anotação: tenta o título/id nos metadados em cache
+                if origens is None:
+                    origens = _origens_em_cache()
+                url, chave = _origem_pelo_nome(nome, origens)
+                if not url:
+                    sem_origem += 1
+                    continue
+                chaves.append(chave)
+                pelo_cache += 1
+            extensao = os.path.splitext(nome)[1].lstrip('.').lower()
+            conexao.executemany("INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?)",
+                                [(chave, f"*:{extensao}", caminho, os.path.getsize(caminho),
+                                  os.path.getmtime(caminho), url) for chave in [chave_video(url), *chaves] if chave])
+            recuperados += 1
+    conexao.commit()
+
+    print(f"\033[1;32m[✓] Índice reconstruído: {recuperados} recuperado(s) ({pelo_cache} pelo cache de metadados), "
+          f"{atualizados} atualizado(s), {removidos} removido(s)\033[0m")
+    if sem_origem:
+        print(f"\033[1;33m[•] {sem_origem} arquivo(s) sem URL de origem (nem anotada na pasta, nem nos "
+              f"metadados do arquivo ou no cache) não foram indexados\033[0m")
+    return {'recuperados': recuperados, 'atualizados': atualizados, 'removidos': removidos,
+            'nao_indexados': sem_origem}
+
+REGEX_SUFIXO_TRECHO = re.compile(r' \[\d+-(?:\d+|fim)\]$')
+
+def _origens_em_cache():
+    """Nome de arquivo esperado (título ou id) -> (URL, chave extrator:id) dos info JSON em cache"""
+    origens = {}
+    try:
+        nomes = os.listdir(PASTA_CACHE)
+    except OSError:
+        return origens
+    yt_dlp = carregar_yt_dlp()
+    for nome in nomes:
+        if not nome.endswith('.info.json'):
+            continue
+        try:
+            with open(os.path.join(PASTA_CACHE, nome)) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue
+        url = info.get('webpage_url') or info.get('original_url')
+        if not url:
+            continue
+        chave = f"{info['extractor_key'].lower()}:{info['id']}" if info.get('extractor_key') and info.get('id') else None
+        nomes_esperados = {info.get('title'), info.get('id') and f"[{info['id']}]"}
+        if info.get('_filename'):
+            nomes_esperados.add(os.path.splitext(os.path.basename(info['_filename']))[0])
+        if yt_dlp is not None and info.get('title'):
+            nomes_esperados.add(yt_dlp.utils.sanitize_filename(info['title']))
+        for esperado in nomes_esperados - {None, ''}:
+            origens[esperado] = (url, chave)
+    return origens
+
+def _origem_pelo_nome(nome, origens):
+    """(URL, chave) do arquivo pelo título (sem o sufixo de trecho) ou por um [id] no nome"""
+    titulo = REGEX_SUFIXO_TRECHO.sub('', os.path.splitext(nome)[0])
+    if titulo in origens:
+        return origens[titulo]
+    for identificador in re.findall(r'\[[\w-]+\]', titulo):
+        if identificador in origens:
+            return origens[identificador]
+    return None, None
+
+def hash_conteudo(caminho):
+    """Hash BLAKE2b do arquivo, lido em blocos num buffer reaproveitado (sem carregá-lo na memória)"""
+    resumo = hashlib.blake2b(digest_size=20)
+    bloco = bytearray(TAMANHO_BLOCO_HASH)
+    visao = memoryview(bloco)
+    with open(caminho, 'rb', buffering=0) as f:
+        while True:
+            lidos = f.readinto(bloco)
+            if not lidos:
+                break
+            resumo.update(visao[:lidos])
+    return resumo.hexdigest()
+
+def indexar_conteudo(caminho, estado, valor=None):
+    """Registra o arquivo no índice de conteúdo (hash None = ainda não calculado)"""
+    conexao = banco()
+    conexao.execute("INSERT OR REPLACE INTO conteudo VALUES (?, ?, ?, ?)",
+                    (caminho, estado.st_size, estado.st_mtime, valor))
+    conexao.commit()
+
+def hash_indexado(caminho, estado=None):
+    """Hash do arquivo, reaproveitando o do índice se tamanho e data não mudaram"""
+    estado = estado or os.stat(caminho)
+    linha = banco().execute("SELECT tamanho, mtime, hash FROM conteudo WHERE caminho = ?", (caminho,)).fetchone()
+    if linha and linha[2] and linha[0] == estado.st_size and linha[1] == estado.st_mtime:
+        return linha[2]
+    valor = hash_conteudo(caminho)
+    indexar_conteudo(caminho, estado, valor)
+    return valor
+
+def substituir_duplicado(original, duplicado, acao=None):
+    """Troca o duplicado por um hardlink do original ou o remove (quando o sistema de arquivos
+    não aceita links, como o /sdcard). Devolve o caminho que passa a valer e o que foi feito."""
+    acao = acao or DEDUPLICACAO
+    if acao == 'desativado':
+        return duplicado, None
+    conexao = banco()
+    if acao == 'link':
+        temporario = duplicado + '.wolflink'
+        try:
+            os.link(original, temporario)
+            os.replace(temporario, duplicado)
+            indexar_conteudo(duplicado, os.stat(duplicado), hash_indexado(original))
+            return duplicado, 'link'
+        except OSError:
+            _remover_silencioso(temporario)
+    try:
+        os.remove(duplicado)
+    except OSError:
+        return duplicado, None
+    # O índice de downloads passa a apontar para a cópia que ficou
+    conexao.execute("UPDATE downloads SET arquivo = ? WHERE arquivo = ?", (original, duplicado))
+    conexao.execute("DELETE FROM conteudo WHERE caminho = ?", (duplicado,))
+    conexao.commit()
+    return original, 'removido'
+
+def deduplicar_arquivo(caminho, saida=None, metricas=None):
+    """Pós-download: aplica DEDUPLICACAO se outro arquivo já tem o mesmo conteúdo.
+    Só calcula hashes quando o índice conhece um arquivo do mesmo tamanho. Devolve o caminho final."""
+    if DEDUPLICACAO == 'desativado' or not caminho or not os.path.isfile(caminho):
+        return caminho
+    caminho = os.path.abspath(caminho)
+    estado = os.stat(caminho)
+    conexao = banco()
+    candidatos = {linha[0] for linha in conexao.execute(
+        "SELECT caminho FROM conteudo WHERE tamanho = ? UNION SELECT arquivo FROM downloads WHERE tamanho = ?",
+        (estado.st_size, estado.st_size))}
+    candidatos.discard(caminho)
+    if not candidatos:
+        indexar_conteudo(caminho, estado)
+        return caminho
+
+    if metricas is not None:
+        metricas.iniciar('deduplicacao')
+    try:
+        valor = hash_indexado(caminho, estado)
+        for candidato in sorted(candidatos):
+            try:
+                estado_candidato = os.stat(candidato)
+            except OSError:
+                conexao.execute("DELETE FROM conteudo WHERE caminho = ?", (candidato,))
+                conexao.commit()
+                continue
+            # Só compara na mesma partição: links não cruzam partições e remover seria mover o arquivo
+            if (estado_candidato.st_size != estado.st_size or estado_candidato.st_dev != estado.st_dev
+                    or os.path.samestat(estado_candidato, estado)):
+                continue
+            if hash_indexado(candidato, estado_candidato) != valor:
+                continue
+            final, feito = substituir_duplicado(candidato, caminho)
+            if feito:
+                registrar(f"\033[1;32m[✓] Conteúdo idêntico a {candidato}: "
+                          f"{'hardlink criado' if feito == 'link' else 'cópia removida'} "
+                          f"({formatar_bytes(estado.st_size)} economizados)\033[0m", saida)
+            return final
+    except OSError as e:
+        registrar(f"\033[1;33m[•] Deduplicação ignorada: {e}\033[0m", saida)
+    finally:
+        if metricas is not None:
+            metricas.encerrar('deduplicacao')
+    return caminho
+
+def _hash_seguro(item):
+    try:
+        return hash_indexado(*item)
+    except OSError:
+        return None
+
+def escanear_biblioteca(pasta=None, workers=None):
+    """Indexa a biblioteca e devolve os grupos de arquivos com conteúdo idêntico (o mais antigo primeiro).
+    Agrupa por tamanho e só calcula, em paralelo, o hash dos arquivos de tamanho repetido."""
+    pasta = os.path.abspath(pasta or PASTA_DOWNLOADS)
+    por_tamanho = {}
+    encontrados = set()
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in arquivos:
+            if nome == ARQUIVO_ORIGENS or re.search(r'\.(part|ytdl|tmp|wolflink)$|\.part-Frag\d+', nome):
+                continue
+            caminho = os.path.join(raiz, nome)
+            try:
+                estado = os.lstat(caminho)
+            except OSError:
+                continue
+            if not stat.S_ISREG(estado.st_mode) or not estado.st_size:
+                continue
+            encontrados.add(caminho)
+            por_tamanho.setdefault((estado.st_dev, estado.st_size), []).append((caminho, estado))
+
+    # Índice de tamanhos para o pós-download; entradas de arquivos que sumiram saem do índice
+    conexao = banco()
+    prefixo = os.path.join(pasta, '')
+    indexados = {caminho: (tamanho, mtime) for caminho, tamanho, mtime in conexao.execute(
+        "SELECT caminho, tamanho, mtime FROM conteudo WHERE substr(caminho, 1, ?) = ?", (len(prefixo), prefixo))}
+    conexao.executemany("DELETE FROM conteudo WHERE caminho = ?", [(c,) for c in indexados.keys() - encontrados])
+    conexao.executemany("INSERT OR REPLACE INTO conteudo VALUES (?, ?, ?, NULL)",
+                        [(c, e.st_size, e.st_mtime) for grupo in por_tamanho.values() if len(grupo) == 1
+                         for c, e in grupo if indexados.get(c) != (e.st_size, e.st_mtime)])
+    conexao.commit()
+
+    itens = [item for grupo in por_tamanho.values() if len(grupo) > 1 for item in grupo]
+    print(f"\033[1;34m[•] {len(encontrados)} arquivo(s) em {pasta}; calculando o hash de {len(itens)} "
+          f"com tamanho repetido ({formatar_bytes(sum(e.st_size for _, e in itens))})\033[0m")
+    with ThreadPoolExecutor(max_workers=max(1, workers or os.cpu_count() or 1)) as executor:
+        hashes = list(executor.map(_hash_seguro, itens))
+
+    por_hash = {}
+    for (caminho, estado), valor in zip(itens, hashes):
+        if valor:
+            por_hash.setdefault((estado.st_dev, valor), []).append((caminho, estado))
+    grupos = []
+    for grupo in por_hash.values():
+        # Hardlinks já existentes são o mesmo arquivo: só conta um por inode
+        inodes = {}
+        for caminho, estado in sorted(grupo, key=lambda item: (item[1].st_mtime, item[0])):
+            inodes.setdefault(estado.st_ino, (caminho, estado))
+        if len(inodes) > 1:
+            grupos.append(list(inodes.values()))
+    return grupos
+
+def aplicar_deduplicacao(grupos, acao=None, ao_substituir=None):
+    """Mantém o primeiro arquivo de cada grupo e aplica a ação nos demais. Devolve (arquivos, bytes)."""
+    quantidade = economizados = 0
+    for original, *duplicados in grupos:
+        for caminho, estado in duplicados:
+            final, feito = substituir_duplicado(original[0], caminho, acao)
+            if not feito:
+                continue
+            quantidade += 1
+            economizados += estado.st_size
+            if ao_substituir:
+                ao_substituir(original[0], caminho, feito)
+    return quantidade, economizados
+
+CONFIG_PERSISTIDA = ['ATUALIZAR_COOKIES_AUTO', 'MAX_DOWNLOADS_SIMULTANEOS', 'MAX_POR_HOST', 'PERFIL_ACELERACAO',
+                     'LIMITE_GLOBAL', 'LIMITE_POR_HOST', 'LIMITES_DOMINIOS', 'AGENDA_LIMITES',
+                     'MAX_CONVERSOES_SIMULTANEAS', 'PLAYLIST_PARAR_APOS_CONHECIDOS', 'USAR_PASTA_TRABALHO',
+                     'DEDUPLICACAO', 'CORTE_PRECISO', 'AJUSTE_AUTOMATICO']
+
+def carregar_config():
+    """Aplica as configurações salvas pelo menu de configurações"""
+    try:
+        with open(ARQUIVO_CONFIG) as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return
+    for nome in CONFIG_PERSISTIDA:
+        if nome in config:
+            globals()[nome] = config[nome]
+    if PERFIL_ACELERACAO not in PERFIS_ACELERACAO:
+        globals()['PERFIL_ACELERACAO'] = 'termux'
+
+def salvar_config():
+    """Grava as configurações atuais para as próximas execuções"""
+    try:
+        os.makedirs(os.path.dirname(ARQUIVO_CONFIG), exist_ok=True)
+        with open(ARQUIVO_CONFIG, 'w') as f:
+            json.dump({nome: globals()[nome] for nome in CONFIG_PERSISTIDA}, f, indent=2)
+    except OSError as e:
+        print(f"\033[1;31m[!] Erro ao salvar configurações: {e}\033[0m")
+
+def parametros_aceleracao(qualidade=None, params_extra=None):
+    """Parâmetros do perfil de aceleração da entrada de qualidade (ou o padrão)"""
+    nome = PERFIL_ACELERACAO
+    for entrada in list(FORMATOS_VIDEO.values()) + list(FORMATOS_AUDIO.values()):
+        if (params_extra and entrada.get('params') == params_extra) or \
+                (not params_extra and qualidade and entrada['code'] == qualidade):
+            nome = entrada.get('aceleracao', nome)
+            break
+    perfil = PERFIS_ACELERACAO.get(nome, PERFIS_ACELERACAO['desligado'])
+    params = perfil['params']
+    fragmentos = ajuste_dispositivo()['fragmentos'] if AJUSTE_AUTOMATICO else None
+    if fragmentos:
+        params = re.sub(r'--concurrent-fragments (\d+)',
+                        lambda encontrado: f'--concurrent-fragments {min(int(encontrado.group(1)), fragmentos)}',
+                        params)
+    # O aria2c não passa pelos hooks de progresso, então fica de fora quando há limite de banda
+    # (e quando o aparelho não aguenta as 8 conexões dele)
+    if perfil.get('aria2c') and shutil.which("aria2c") and not limites_ativos() and not fragmentos:
+        params += ' --downloader aria2c --downloader-args "aria2c:-x 8 -s 8 -k 1M"'
+    return params
+
+def dominio_de(url):
+    """Host da URL sem 'www.'"""
+    host = urlparse(url).netloc.lower().split('@')[-1].split(':')[0]
+    return host[4:] if host.startswith('www.') else host
+
+def _limites_do_dominio(dominio):
+    for nome, limites in LIMITES_DOMINIOS.items():
+        if dominio == nome or dominio.endswith('.' + nome):
+            return limites
+    return {}
+
+def limite_global_atual():
+    """Limite global vigente, considerando a agenda por horário"""
+    agora = datetime.now().strftime("%H:%M")
+    for janela in AGENDA_LIMITES:
+        inicio, fim = janela['inicio'], janela['fim']
+        dentro = inicio <= agora < fim if inicio <= fim else (agora >= inicio or agora < fim)
+        if dentro:
+            return janela['taxa']
+    return LIMITE_GLOBAL
+
+def limite_dominio(dominio):
+    """Limite de bytes/s de um domínio"""
+    return _limites_do_dominio(dominio).get('taxa', LIMITE_POR_HOST)
+
+def limites_ativos():
+    """Indica se algum limite de banda está configurado"""
+    return bool(LIMITE_GLOBAL or LIMITE_POR_HOST or AGENDA_LIMITES or
+                any(l.get('taxa') for l in LIMITES_DOMINIOS.values()))
+
+class BaldeTokens:
+    """Balde de tokens: limita a taxa de bytes compartilhada entre downloads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = 0.0
+        self.ultimo = time()
+
+    def consumir(self, quantidade, taxa):
+        """Desconta os bytes e devolve quantos segundos o chamador deve esperar"""
+        with self.lock:
+            agora = time()
+            if taxa <= 0:
+                self.tokens, self.ultimo = 0.0, agora
+                return 0
+            self.tokens = min(taxa, self.tokens + (agora - self.ultimo) * taxa) - quantidade
+            self.ultimo = agora
+            return -self.tokens / taxa if self.tokens < 0 else 0
+
+_balde_global = BaldeTokens()
+_baldes_dominios = {}
+_baldes_lock = threading.Lock()
+_downloads_ativos = 0
+
+def _alterar_downloads_ativos(delta):
+    global _downloads_ativos
+    with _baldes_lock:
+        _downloads_ativos += delta
+
+def _balde_dominio(dominio):
+    with _baldes_lock:
+        if dominio not in _baldes_dominios:
+            _baldes_dominios[dominio] = BaldeTokens()
+        return _baldes_dominios[dominio]
+
+def regular_banda(ctx, d):
+    """Segura o download (dentro do hook de progresso) quando excede os limites"""
+    chave = d.get('tmpfilename') or d.get('filename')
+    baixado = d.get('downloaded_bytes') or 0
+    with ctx.lock:
+        delta = max(0, baixado - ctx.baixados.get(chave, 0))
+        ctx.baixados[chave] = max(baixado, ctx.baixados.get(chave, 0))
+    if not delta:
+        return
+    espera = _balde_global.consumir(delta, limite_global_atual())
+    if ctx.dominio:
+        espera = max(espera, _balde_dominio(ctx.dominio).consumir(delta, limite_dominio(ctx.dominio)))
+    while espera > 0 and not job_cancelado(ctx.resultado):
+        sleep(min(espera, 0.5))
+        espera -= 0.5
+
+def taxa_subprocesso(dominio):
+    """Limite (--limit-rate) para o fallback em subprocesso, que não passa pelo balde"""
+    taxas = []
+    if limite_global_atual():
+        taxas.append(limite_global_atual() / max(1, _downloads_ativos))
+    if dominio and limite_dominio(dominio):
+        taxas.append(limite_dominio(dominio))
+    return int(min(taxas)) if taxas else 0
+
 def clear_screen():
     os.system('clear' if os.name == 'posix' else 'cls')
 
@@ -274,26 +1813,111 @@ def atualizar_ferramentas():
     """Atualiza o yt-dlp corretamente via pip"""
     print("\033[1;33m[•] Atualizando ferramentas...\033[0m")
     try:
-        subprocess.run([sys.executable, "-m", "pip", "install", "--user", "--upgrade", "yt-dlp", "requests"], check=True)
+        subprocess.run(comando_pip_atualizacao(), check=True)
+        salvar_impressao_ambiente(atualizado=True)
         print("\033[1;32m[✓] Ferramentas atualizadas com sucesso!\033[0m")
+        if 'yt_dlp' in sys.modules:
+            print("\033[1;33m[•] Reinicie o Wolf para usar a nova versão do yt-dlp\033[0m")
     except Exception as e:
         print(f"\033[1;31m[!] Erro ao atualizar: {e}\033[0m")
 
-def atualizar_cookies():
-    """Atualiza cookies a partir da URL"""
+_sessao_http = None
+_cookies_lock = threading.Lock()
+
+def sessao_http():
+    """Sessão HTTP persistente (reaproveita conexões entre requisições)"""
+    global _sessao_http
+    if _sessao_http is None:
+        _sessao_http = requests.Session()
+        _sessao_http.headers['User-Agent'] = USER_AGENT
+    return _sessao_http
+
+def _caminho_meta_cookies():
+    return ARQUIVO_COOKIES + ".meta.json"
+
+def _carregar_meta_cookies():
     try:
-        print("\033[1;34m[•] Baixando novos cookies...\033[0m")
-        headers = {'User-Agent': USER_AGENT}
-        response = requests.get(URL_ATUALIZACAO_COOKIES, headers=headers, timeout=10)
+        with open(_caminho_meta_cookies()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-        if response.status_code == 200:
-            with open(ARQUIVO_COOKIES, 'w') as f:
-                f.write(response.text)
-            print("\033[1;32m[✓] Cookies atualizados com sucesso!\033[0m")
-        else:
-            print("\033[1;31m[!] Falha ao baixar cookies. Status code:", response.status_code, "\033[0m")
-    except Exception as e:
-        print(f"\033[1;31m[!] Erro ao atualizar cookies: {str(e)}\033[0m")
+def _salvar_meta_cookies(meta):
+    caminho = _caminho_meta_cookies()
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(caminho)), prefix=".cookies_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temporario, caminho)
+    except BaseException:
+        _remover_silencioso(temporario)
+        raise
+
+def _assinatura_cookies():
+    """Tamanho e mtime do arquivo de cookies (None se não existir)"""
+    try:
+        estado = os.stat(ARQUIVO_COOKIES)
+    except OSError:
+        return None
+    return [estado.st_size, estado.st_mtime_ns]
+
+def atualizar_cookies(forcar=False, silencioso=False):
+    """Atualiza cookies a partir da URL (só baixa se houver mudança)"""
+    def mostrar(mensagem):
+        if not silencioso or VERBOSO:
+            print(mensagem)
+
+    with _cookies_lock:
+        try:
+            meta = _carregar_meta_cookies()
+            # Os metadados só valem para o arquivo que foi baixado: apagado ou trocado
+            # (ex: pelo arquivo padrão de criar_cookies), baixa de novo sem condicionais
+            assinatura = _assinatura_cookies()
+            meta_valida = assinatura is not None and meta.get('assinatura') == assinatura
+            if not forcar and meta_valida and time() - meta.get('verificado_em', 0) < INTERVALO_COOKIES:
+                mostrar("\033[1;32m[✓] Cookies verificados recentemente\033[0m")
+                return
+
+            mostrar("\033[1;34m[•] Verificando novos cookies...\033[0m")
+            headers = {}
+            if meta_valida:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+            response = sessao_http().get(URL_ATUALIZACAO_COOKIES, headers=headers, timeout=10)
+
+            if response.status_code == 304:
+                meta['verificado_em'] = time()
+                _salvar_meta_cookies(meta)
+                mostrar("\033[1;32m[✓] Cookies já estão atualizados\033[0m")
+            elif response.status_code == 200:
+                # Grava em arquivo temporário e renomeia para não deixar cookies pela metade
+                pasta = os.path.dirname(os.path.abspath(ARQUIVO_COOKIES))
+                fd, temporario = tempfile.mkstemp(dir=pasta, prefix=".cookies_", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, 'w') as f:
+                        f.write(response.text)
+                    os.replace(temporario, ARQUIVO_COOKIES)
+                except BaseException:
+                    _remover_silencioso(temporario)
+                    raise
+                _salvar_meta_cookies({
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'verificado_em': time(),
+                    'assinatura': _assinatura_cookies(),
+                })
+                reiniciar_motores()
+                mostrar("\033[1;32m[✓] Cookies atualizados com sucesso!\033[0m")
+            else:
+                mostrar(f"\033[1;31m[!] Falha ao baixar cookies. Status code: {response.status_code}\033[0m")
+        except Exception as e:
+            mostrar(f"\033[1;31m[!] Erro ao atualizar cookies: {str(e)}\033[0m")
+
+def atualizar_cookies_em_segundo_plano():
+    """Atualiza os cookies numa thread sem bloquear o menu ou downloads"""
+    threading.Thread(target=atualizar_cookies, kwargs={'silencioso': True}, daemon=True).start()
 
 def mostrar_menu_video_qualidade():
     """Mostra menu de qualidade para vídeos"""
@@ -326,11 +1950,46 @@ def mostrar_menu_audio_formatos():
 ╚════════════════════════════════════════╝
 \033[0m""")
 
+def perguntar_trechos(link):
+    """Pergunta quais trechos baixar (None = mídia inteira); 'c' lista os capítulos"""
+    while True:
+        resposta = input("\033[1;36m✂️  Trecho (Enter = inteiro; ex: 1:30-4:00,10:00- ou nome do capítulo; "
+                         "'c' lista capítulos): \033[0m").strip()
+        if not resposta:
+            return None
+        if resposta.lower() == 'c':
+            opcoes = f'yt-dlp --user-agent "{USER_AGENT}" --cookies "{ARQUIVO_COOKIES}" --no-check-certificate'
+            try:
+                capitulos = ler_info(obter_info(link, opcoes)).get('chapters') or []
+            except FalhaDownload as e:
+                print(f"\033[1;31m[!] {e}\033[0m")
+                continue
+            if not capitulos:
+                print("\033[1;33m[•] Este vídeo não tem capítulos\033[0m")
+            for capitulo in capitulos:
+                print(f"\033[1;34m  {formatar_tempo(capitulo['start_time'])}-"
+                      f"{formatar_tempo(capitulo['end_time'])}  {capitulo.get('title') or ''}\033[0m")
+            continue
+        try:
+            interpretar_trechos(resposta)
+        except ValueError as e:
+            print(f"\033[1;31m[!] {e}\033[0m")
+            continue
+        return resposta
+
 def listar_formatos(link):
     """Lista os formatos disponíveis para download"""
     print("\033[1;36m[•] Listando formatos disponíveis...\033[0m")
     try:
-        subprocess.run(f'yt-dlp --cookies "{ARQUIVO_COOKIES}" -F "{link}"', shell=True)
+        opcoes = f'yt-dlp --user-agent "{USER_AGENT}" --cookies "{ARQUIVO_COOKIES}" --no-check-certificate'
+        try:
+            info_arquivo = obter_info(link, opcoes)
+            if motor_disponivel():
+                listar_formatos_motor(opcoes, info_arquivo)
+            else:
+                subprocess.run(f'{opcoes} --load-info-json "{info_arquivo}" -F', shell=True)
+        except FalhaDownload as e:
+            print(f"\033[1;31m[!] {e}\033[0m")
 
         # Mostra menu de qualidade após listar formatos
         while True:
@@ -341,7 +2000,7 @@ def listar_formatos(link):
                 break
             elif opcao in FORMATOS_VIDEO:
                 qualidade = FORMATOS_VIDEO[opcao]['code']
-                if baixar_video(link, 'mp4', qualidade):
+                if baixar_video(link, 'mp4', qualidade, trechos=perguntar_trechos(link)):
                     print(f"\033[1;32m[✓] Arquivo salvo em: {PASTA_DOWNLOADS}\033[0m")
                 break
             else:
@@ -352,6 +2011,9 @@ def listar_formatos(link):
 
 def baixar_multiplas_urls(tipo='video'):
     """Baixa múltiplas URLs de uma vez"""
+    if oferecer_retomada():
+        return
+
     print("\033[1;36m[•] Modo múltiplas URLs (CTRL+D para finalizar)\033[0m")
     print("\033[1;33m[•] Cole as URLs uma por linha:\033[0m")
 
@@ -379,85 +2041,1576 @@ def baixar_multiplas_urls(tipo='video'):
             qualidade = 'best'
     else:
         mostrar_menu_audio_formatos()
-        opcao = input("\n\033[1;36m🎵 Escolha o formato [1-6]: \033[0m").strip()
-        if opcao in FORMATOS_AUDIO:
-            formato = FORMATOS_AUDIO[opcao]
+        opcao = input("\n\033[1;36m🎵 Escolha o(s) formato(s) [1-6, ex: 1,3]: \033[0m").strip()
+        alvos = alvos_audio(opcao) or ['1']
+
+    tem_playlist = any(parece_playlist(url) for url in urls)
+    workers = MAX_DOWNLOADS_SIMULTANEOS
+    if len(urls) > 1 or tem_playlist:
+        resposta = input(f"\n\033[1;36m⚡ Downloads simultâneos [{workers}]: \033[0m").strip()
+        if resposta.isdigit() and int(resposta) > 0:
+            workers = int(resposta)
+
+    if tipo == 'video':
+        formato, params_extra = 'mp4', None
+    else:
+        formato, qualidade, params_extra = 'audio', ','.join(alvos), None
+    if tem_playlist:
+        # Playlists viram um gerador: os primeiros itens baixam enquanto as próximas páginas carregam
+        urls = expandir_urls(urls, perfil_download(formato, qualidade, params_extra))
+    executar_lote(urls, formato, qualidade, params_extra, workers)
+
+def formatar_bytes(tamanho):
+    """Formata um tamanho em bytes para leitura humana"""
+    for unidade in ['B', 'KB', 'MB', 'GB']:
+        if tamanho < 1024 or unidade == 'GB':
+            break
+        tamanho /= 1024
+    return f"{tamanho:.1f} {unidade}"
+
+class LimitadorHosts:
+    """Limita quantos downloads simultâneos cada host pode receber"""
+
+    def __init__(self, maximo=None):
+        self.maximo = maximo
+        self.lock = threading.Lock()
+        self.semaforos = {}
+
+    def semaforo(self, url):
+        host = dominio_de(url)
+        with self.lock:
+            if host not in self.semaforos:
+                limite = _limites_do_dominio(host).get('conexoes') or self.maximo or MAX_POR_HOST
+                self.semaforos[host] = threading.BoundedSemaphore(limite)
+            return self.semaforos[host]
+
+def criar_lote():
+    """Gera o id de um novo lote da fila persistente"""
+    return f"{int(time() * 1000)}"
+
+def adicionar_job(lote, indice, url, formato, qualidade, params_extra, playlist=None, trechos=None):
+    """Grava um job na fila persistente e devolve sua linha"""
+    conexao = banco()
+    cursor = conexao.execute(
+        "INSERT INTO fila (lote, indice, url, formato, qualidade, params_extra, atualizado_em, playlist, trechos) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (lote, indice, url, formato, qualidade, params_extra, time(), playlist, trechos))
+    conexao.commit()
+    return (cursor.lastrowid, indice, url, None, playlist)
+
+def _jobs_do_lote(lote, urls, formato, qualidade, params_extra, trechos=None):
+    """Gera os jobs do lote: URLs novas são gravadas na fila conforme chegam"""
+    if urls is None:
+        yield from banco().execute(
+            "SELECT id, indice, url, arquivo_parcial, playlist FROM fila "
+            "WHERE lote = ? AND estado IN ('pendente', 'executando') ORDER BY indice", (lote,)).fetchall()
+        return
+    for indice, item in enumerate(urls, 1):
+        # Itens de playlist chegam como (url, playlist) para a sincronização incremental
+        url, playlist = item if isinstance(item, tuple) else (item, None)
+        yield adicionar_job(lote, indice, url, formato, qualidade, params_extra, playlist, trechos)
+
+def lotes_interrompidos(daemon=False):
+    """Lista os lotes com jobs pendentes ou interrompidos no meio (os do daemon ficam à parte)"""
+    return banco().execute(
+        "SELECT lote, formato, qualidade, params_extra, "
+        "SUM(estado IN ('pendente', 'executando')), COUNT(*), trechos FROM fila WHERE (lote LIKE 'daemon_%') = ? "
+        "GROUP BY lote HAVING SUM(estado IN ('pendente', 'executando')) > 0 ORDER BY lote",
+        (daemon,)).fetchall()
+
+def atualizar_job(job_id, **campos):
+    """Atualiza o estado de um job da fila"""
+    campos['atualizado_em'] = time()
+    colunas = ", ".join(f"{nome} = ?" for nome in campos)
+    conexao = banco()
+    conexao.execute(f"UPDATE fila SET {colunas} WHERE id = ?", (*campos.values(), job_id))
+    conexao.commit()
+
+def descartar_lote(lote):
+    """Remove todos os jobs do lote da fila"""
+    conexao = banco()
+    conexao.execute("DELETE FROM fila WHERE lote = ?", (lote,))
+    conexao.commit()
+
+def oferecer_retomada():
+    """Pergunta se o usuário quer retomar um lote interrompido"""
+    lotes = lotes_interrompidos()
+    if not lotes:
+        return False
+
+    lote, formato, qualidade, params_extra, pendentes, total, trechos = lotes[-1]
+    print(f"\033[1;33m[•] Lote interrompido encontrado: {pendentes} de {total} job(s) pendente(s)\033[0m")
+    resposta = input("\033[1;36m[?] Retomar de onde parou? [S/n]: \033[0m").strip().lower()
+    if resposta in ('n', 'nao', 'não'):
+        descartar_lote(lote)
+        print("\033[1;33m[•] Lote descartado\033[0m")
+        return False
+
+    executar_lote(None, formato, qualidade, params_extra, lote=lote, trechos=trechos)
+    return True
+
+def parece_playlist(url):
+    """Indica se a URL aponta para uma playlist ou canal"""
+    return bool(REGEX_PLAYLIST.search(url))
+
+def intervalos_itens(especificacao):
+    """Converte '1-10,15,30-' em intervalos (inicio, fim); fim None = até o último item"""
+    intervalos = []
+    for parte in especificacao.replace(' ', '').split(','):
+        encontrado = re.fullmatch(r'(\d+)(?:(-)(\d*))?', parte)
+        if not encontrado:
+            raise ValueError(f"Intervalo de itens inválido: {parte}")
+        inicio = int(encontrado.group(1))
+        if encontrado.group(2):
+            fim = int(encontrado.group(3)) if encontrado.group(3) else None
         else:
-            formato = FORMATOS_AUDIO['1']
+            fim = inicio
+        intervalos.append((inicio, fim))
+    return intervalos
+
+def itens_sincronizados(playlist, perfil):
+    """Chaves dos itens da playlist já baixados nesse perfil"""
+    linhas = banco().execute("SELECT chave FROM sincronizacao WHERE playlist = ? AND perfil = ?",
+                             (playlist, perfil)).fetchall()
+    return {chave for chave, in linhas}
+
+def marcar_sincronizado(playlist, url, perfil):
+    """Registra o item da playlist como concluído"""
+    conexao = banco()
+    conexao.execute("INSERT OR REPLACE INTO sincronizacao VALUES (?, ?, ?, ?)",
+                    (playlist, chave_video(url), perfil, time()))
+    conexao.commit()
+
+def _paginas_entradas(entradas, tamanho=50):
+    """Percorre as entradas da playlist página a página (listas paginadas não são iteráveis)"""
+    if not isinstance(entradas, carregar_yt_dlp().utils.PagedList):
+        yield from entradas
+        return
+    inicio = 0
+    while True:
+        pagina = entradas.getslice(inicio, inicio + tamanho)
+        if not pagina:
+            return
+        yield from pagina
+        inicio += len(pagina)
+
+def _entradas_motor(link, opcoes_cli):
+    """Entradas da playlist extraídas sob demanda pelo motor interno"""
+    ydl = obter_motor(opcoes_cli)
+    ctx = contexto()
+    ctx.saida = None
+    ctx.ultimo_erro = None
+    info = ydl.extract_info(link, download=False, process=False)
+    # Canais costumam redirecionar para a aba de vídeos antes de listar as entradas
+    for _ in range(3):
+        if info is None or info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    if info is None:
+        raise FalhaDownload(ctx.ultimo_erro or "Falha ao listar a playlist")
+    if info.get('_type') != 'playlist':
+        yield {'url': link, '_type': 'url'}
+        return
+    yield from _paginas_entradas(info.get('entries') or [])
 
-    for i, url in enumerate(urls, 1):
-        print(f"\n\033[1;35m[•] Baixando URL {i}/{len(urls)}\033[0m")
-        if tipo == 'video':
-            baixar_video(url, 'mp4', qualidade)
+def _entradas_subprocesso(link, opcoes_cli):
+    """Entradas da playlist lidas linha a linha do yt-dlp -j"""
+    processo = subprocess.Popen(shlex.split(opcoes_cli) + ['-j', link], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True)
+    try:
+        for linha in processo.stdout:
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                continue
+    finally:
+        if processo.poll() is None:
+            processo.kill()
+        processo.wait()
+
+def expandir_playlist(link, itens=None, perfil=None):
+    """Gera (url, playlist) para cada item da playlist/canal conforme as páginas chegam,
+    respeitando o intervalo de itens e pulando os itens já sincronizados"""
+    playlist = normalizar_url(link)
+    intervalos = intervalos_itens(itens) if itens else None
+    ultimo = None
+    if intervalos and all(fim is not None for _, fim in intervalos):
+        ultimo = max(fim for _, fim in intervalos)
+    conhecidos = itens_sincronizados(playlist, perfil) if perfil else set()
+    opcoes = (f'yt-dlp --user-agent "{USER_AGENT}" --cookies "{ARQUIVO_COOKIES}" '
+              f'--flat-playlist --lazy-playlist')
+    entradas = _entradas_motor(link, opcoes) if motor_disponivel() else _entradas_subprocesso(link, opcoes)
+
+    print(f"\033[1;34m[•] Expandindo playlist: {link}\033[0m")
+    pulados = seguidos = 0
+    for indice, entrada in enumerate(entradas, 1):
+        if ultimo is not None and indice > ultimo:
+            break
+        if intervalos and not any(inicio <= indice and (fim is None or indice <= fim)
+                                  for inicio, fim in intervalos):
+            continue
+        if entrada.get('_type') in ('url', 'url_transparent'):
+            url = entrada.get('url')
         else:
-            baixar_video(url, formato['code'], None, formato['params'])
+            url = entrada.get('webpage_url') or entrada.get('url')
+        if not url or not url.startswith(('http://', 'https://')):
+            continue
+        if chave_video(url) in conhecidos:
+            pulados += 1
+            seguidos += 1
+            if PLAYLIST_PARAR_APOS_CONHECIDOS and seguidos >= PLAYLIST_PARAR_APOS_CONHECIDOS:
+                print(f"\033[1;33m[•] {seguidos} item(ns) seguidos já sincronizados; "
+                      f"encerrando a expansão\033[0m")
+                break
+            continue
+        seguidos = 0
+        yield url, playlist
+    if pulados:
+        print(f"\033[1;32m[✓] {pulados} item(ns) já sincronizados anteriormente foram pulados\033[0m")
 
-def baixar_video(link, formato='mp4', qualidade=None, params_extra=None):
-    """Executa o download com múltiplas estratégias e fallback automático"""
-    tentativas = [
-        f'yt-dlp --user-agent "{USER_AGENT}" --cookies "{ARQUIVO_COOKIES}" --no-check-certificate',
-        f'yt-dlp --user-agent "{USER_AGENT}" --cookies "{ARQUIVO_COOKIES}" --force-generic-extractor',
-        'yt-dlp --ignore-errors'
-    ]
+def expandir_urls(urls, perfil=None, itens=None, forcar=False):
+    """Gera as URLs do lote, expandindo playlists e canais sob demanda"""
+    for url in urls:
+        if not (forcar or parece_playlist(url)):
+            yield url
+            continue
+        try:
+            yield from expandir_playlist(url, itens, perfil)
+        except Exception as e:
+            print(f"\033[1;31m[!] Falha ao expandir a playlist {url}: {e}\033[0m")
+
+def baixar_playlist(link, formato='mp4', qualidade=None, params_extra=None):
+    """Baixa uma playlist/canal como lote, começando antes de a lista terminar de carregar"""
+    print("\033[1;33m[•] Playlist/canal detectado\033[0m")
+    itens = input("\033[1;36m[?] Itens a baixar (Enter = todos, ex: 1-10,15,30-): \033[0m").strip()
+    try:
+        if itens:
+            intervalos_itens(itens)
+    except ValueError as e:
+        print(f"\033[1;31m[!] {e}\033[0m")
+        return []
+    perfil = perfil_download(formato, qualidade, params_extra)
+    return executar_lote(expandir_urls([link], perfil, itens or None), formato, qualidade, params_extra)
+
+def _executar_job(job, total, formato, qualidade, params_extra, limitador, pasta_log, ao_progresso=None,
+                  trechos=None):
+    """Executa um job do lote (com log próprio se houver pasta de log) e devolve o resultado"""
+    job_id, indice, url, arquivo_parcial, playlist = job
+    posicao = f"{indice}/{total}" if total else f"{indice}"
+    caminho_log = os.path.join(pasta_log, f"job_{indice:04d}.log") if pasta_log else None
+    resultado = {'indice': indice, 'url': url, 'log': caminho_log, 'arquivo': None, 'bytes': 0,
+                 'job_id': job_id, 'parcial': arquivo_parcial, 'playlist': playlist,
+                 'perfil': perfil_download(formato, qualidade, params_extra, trechos), 'ao_progresso': ao_progresso}
+
+    with limitador.semaforo(url):
+        if caminho_log:
+            print(f"\033[1;35m[•] [{posicao}] Iniciando: {url}\033[0m")
+        else:
+            print(f"\n\033[1;35m[•] Baixando URL {posicao}\033[0m")
+        if arquivo_parcial and os.path.exists(arquivo_parcial):
+            print(f"\033[1;33m[•] [{posicao}] Continuando download parcial: {arquivo_parcial}\033[0m")
+        banco().execute("UPDATE fila SET estado = 'executando', tentativas = tentativas + 1, "
+                        "atualizado_em = ? WHERE id = ?", (time(), job_id))
+        banco().commit()
+        inicio = time()
+        log = open(caminho_log, 'a') if caminho_log else None
+        try:
+            if formato == 'audio':
+                conversao = baixar_audio(url, alvos_audio(qualidade), log, resultado, trechos)
+            else:
+                sucesso = baixar_video(url, formato, qualidade, params_extra, saida=log, resultado=resultado,
+                                       trechos=trechos)
+        finally:
+            if log is not None:
+                log.close()
+
+    if formato == 'audio':
+        # O worker já segue para o próximo download; o job termina junto com a conversão
+        conversao.add_done_callback(
+            lambda futuro: _finalizar_job(resultado, futuro.result(), inicio, posicao, caminho_log))
+        resultado['conversao'] = conversao
+        return resultado
+    return _finalizar_job(resultado, sucesso, inicio, posicao, caminho_log)
+
+def _finalizar_job(resultado, sucesso, inicio, posicao, caminho_log):
+    """Grava o estado final do job na fila e informa o resultado"""
+    job_id, url = resultado['job_id'], resultado['url']
+    resultado['sucesso'] = sucesso
+    resultado['duracao'] = time() - inicio
+    if _cancelamento.is_set() and not sucesso:
+        atualizar_job(job_id, estado='pendente')
+        return resultado
+    if job_id in _jobs_cancelados and not sucesso:
+        resultado['cancelado'] = True
+        atualizar_job(job_id, estado='cancelado')
+        return resultado
+    atualizar_job(job_id, estado='concluido' if sucesso else 'falhou', arquivo=resultado.get('arquivo'))
+    if sucesso and resultado.get('playlist'):
+        marcar_sincronizado(resultado['playlist'], url, resultado['perfil'])
+
+    if not caminho_log:
+        return resultado
+    if sucesso:
+        print(f"\033[1;32m[✓] [{posicao}] Concluído em {resultado['duracao']:.1f}s "
+              f"({formatar_bytes(resultado['bytes'])}): {url}\033[0m")
+    else:
+        print(f"\033[1;31m[!] [{posicao}] Falhou: {url} (log: {caminho_log})\033[0m")
+    return resultado
+
+class PreExtrator:
+    """Resolve os metadados dos próximos itens do lote enquanto os atuais baixam. Só os futures
+    da janela ficam em memória: os metadados vão para o cache em disco, que já tem limites,
+    e o job relê de lá (extraindo de novo se as URLs assinadas estiverem perto de expirar)."""
+
+    def __init__(self, perfil, formato, janela=PREFETCH_ITENS):
+        self.perfil = perfil
+        self.formato = formato
+        self.janela = janela
+        self.executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        self.lock = threading.Lock()
+        self.futuros = {}
+        self.parar = threading.Event()
+        # As mensagens da extração antecipada não interessam: falhas aparecem no próprio job
+        self.saida = open(os.devnull, 'w')
+
+    def antecipar(self, jobs):
+        """Repassa cada job assim que ele chega. Uma thread lê a fonte até `janela` itens à frente
+        e só os que já estão nesse buffer têm a extração disparada: uma fonte lenta (stdin, CLI)
+        nunca segura o job que já chegou."""
+        buffer = queue.Queue(maxsize=max(1, self.janela))
+        fim = object()
+        agendados = set()
+
+        def entregar(item):
+            while not self.parar.is_set():
+                try:
+                    buffer.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def ler():
+            try:
+                for job in jobs:
+                    if not entregar(job):
+                        return
+            except BaseException as e:
+                entregar(e)
+                return
+            entregar(fim)
+
+        threading.Thread(target=ler, name="prefetch-leitor", daemon=True).start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is fim:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                for proximo in list(buffer.queue):
+                    if proximo is not fim and not isinstance(proximo, BaseException) and proximo[0] not in agendados:
+                        agendados.add(proximo[0])
+                        self._agendar(proximo[2])
+                yield item
+        finally:
+            self.parar.set()
+
+    def _agendar(self, url):
+        if info_em_cache(url) or (self.formato and consultar_indice(chave_video(url), self.perfil, self.formato)):
+            return
+        dominio = dominio_de(url)
+        if circuito_dominio(dominio).bloqueado():
+            return
+        with self.lock:
+            if url not in self.futuros:
+                self.futuros[url] = self.executor.submit(self._extrair, url, dominio)
+
+    def _extrair(self, url, dominio):
+        if _cancelamento.is_set():
+            return
+        try:
+            obter_info(url, opcoes_estrategias()[ordem_estrategias(dominio)[0]], self.saida)
+        except Exception:
+            pass    # o job extrai de novo e trata a falha com as estratégias de sempre
+
+    def aguardar(self, url):
+        """Espera a extração antecipada do item (se ainda estiver em andamento) antes de o job usá-lo"""
+        with self.lock:
+            futuro = self.futuros.pop(url, None)
+        if futuro is not None and not _cancelamento.is_set():
+            wait([futuro])
+
+    def encerrar(self):
+        self.parar.set()
+        try:
+            self.executor.shutdown(wait=not _cancelamento.is_set(), cancel_futures=True)
+        finally:
+            # Extrações ainda em andamento após uma interrupção só perdem as mensagens
+            self.saida.close()
+
+def executar_lote(urls, formato='mp4', qualidade=None, params_extra=None,
+                  workers=None, por_host=None, lote=None, ao_concluir=None, trechos=None):
+    """Baixa URLs (lista ou iterador consumido sob demanda) ou retoma um lote salvo,
+    com um pool limitado de workers"""
+    if lote is None:
+        lote = criar_lote()
+        total = len(urls) if isinstance(urls, (list, tuple)) else None
+    else:
+        urls = None
+        total = banco().execute("SELECT COUNT(*) FROM fila WHERE lote = ?", (lote,)).fetchone()[0]
+    workers = max(1, workers or MAX_DOWNLOADS_SIMULTANEOS)
+    if total:
+        workers = min(workers, total)
+    ajustados = downloads_simultaneos(workers)
+    if ajustados < workers:
+        print(f"\033[1;33m[•] Ajuste automático: {ajustados} download(s) simultâneo(s) em vez de {workers} "
+              f"({', '.join(ajuste_dispositivo()['motivos']) or 'memória disponível'})\033[0m")
+        workers = ajustados
+    limitador = LimitadorHosts(por_host or MAX_POR_HOST)
+    resultados = []
+    conversoes = []
+    inicio = time()
+    _cancelamento.clear()
+
+    def concluir(resultado):
+        resultados.append(resultado)
+        if ao_concluir:
+            ao_concluir(resultado)
+
+    def tarefa(job, pasta_log):
+        # Roda na thread do worker: o resultado sai assim que o job termina
+        try:
+            if pre_extrator is not None:
+                pre_extrator.aguardar(job[2])
+            resultado = _executar_job(job, total, formato, qualidade, params_extra, limitador, pasta_log,
+                                      trechos=trechos)
+        except Exception as e:
+            print(f"\033[1;31m[!] Erro inesperado no job {job[1]}: {e}\033[0m")
+            resultado = {'indice': job[1], 'url': job[2], 'sucesso': False, 'bytes': 0}
+        conversao = resultado.pop('conversao', None)
+        if conversao is None:
+            concluir(resultado)
+            return
+        fim = Future()
+        conversoes.append(fim)
+
+        def ao_converter(_):
+            concluir(resultado)
+            fim.set_result(resultado)
+        conversao.add_done_callback(ao_converter)
+
+    print(f"\n\033[1;34m[•] Baixando {total or 'as'} URL(s) com {workers} download(s) simultâneo(s)\033[0m")
+
+    jobs = _jobs_do_lote(lote, urls, formato, qualidade, params_extra, trechos)
+    pre_extrator = None
+    if PREFETCH_ITENS > 0 and total != 1:
+        # Áudio é indexado por formato de saída: aí só o cache de metadados evita a pré-extração
+        pre_extrator = PreExtrator(perfil_download(formato, qualidade, params_extra, trechos),
+                                   None if formato == 'audio' or trechos else formato)
+        jobs = pre_extrator.antecipar(jobs)
+    try:
+        if workers == 1:
+            for job in jobs:
+                tarefa(job, None)
+        else:
+            pasta_log = os.path.join(PASTA_LOGS, f"lote_{lote}")
+            os.makedirs(pasta_log, exist_ok=True)
+            executor = ThreadPoolExecutor(max_workers=workers)
+            pendentes = set()
+            try:
+                for job in jobs:
+                    if len(pendentes) >= workers * 2:
+                        _, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                    pendentes.add(executor.submit(tarefa, job, pasta_log))
+                wait(pendentes)
+            except KeyboardInterrupt:
+                # Interrompe os downloads em andamento; a fila guarda o estado para retomar
+                _cancelamento.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            executor.shutdown()
+    finally:
+        if pre_extrator is not None:
+            pre_extrator.encerrar()
+
+    if conversoes and not all(fim.done() for fim in conversoes):
+        print("\033[1;34m[•] Aguardando o estágio de conversão...\033[0m")
+    try:
+        wait(conversoes)
+    except KeyboardInterrupt:
+        _cancelamento.set()
+        raise
+
+    mostrar_resumo_lote(resultados, time() - inicio)
+    mostrar_resumo_metricas([r.get('metricas') for r in resultados], "MÉTRICAS DO LOTE")
+    descartar_lote(lote)
+    return resultados
+
+def mostrar_resumo_lote(resultados, duracao):
+    """Mostra o resumo agregado de um lote de downloads"""
+    sucessos = [r for r in resultados if r.get('sucesso')]
+    ignorados = [r for r in sucessos if r.get('ignorado')]
+    falhas = [r for r in resultados if not r.get('sucesso')]
+    total_bytes = sum(r.get('bytes', 0) for r in sucessos)
+    velocidade = total_bytes / duracao if duracao > 0 else 0
+
+    print(f"""\n\033[1;36m╔════════════════════════════════════════╗
+║            📊 RESUMO DO LOTE           ║
+╚════════════════════════════════════════╝\033[0m
+\033[1;32m[✓] Concluídos: {len(sucessos)} ({len(ignorados)} já baixado(s) antes)\033[0m
+\033[1;31m[!] Falhas: {len(falhas)}\033[0m
+\033[1;34m[•] Total baixado: {formatar_bytes(total_bytes)} em {duracao:.1f}s ({formatar_bytes(velocidade)}/s)\033[0m""")
+    for r in sorted(falhas, key=lambda r: r['indice']):
+        detalhe = f" (log: {r['log']})" if r.get('log') else ""
+        print(f"\033[1;31m    • {r['url']}{detalhe}\033[0m")
 
-    output_template = f'"{PASTA_DOWNLOADS}/%(title)s.%(ext)s"'
-    comando_base = None
+def registrar(mensagem, saida=None):
+    """Escreve a mensagem no terminal ou no log do job"""
+    if saida is None:
+        print(mensagem)
+    else:
+        saida.write(mensagem + "\n")
+        saida.flush()
+
+def baixar_video(link, formato='mp4', qualidade=None, params_extra=None, saida=None, resultado=None,
+                 pasta=None, metricas=None, trechos=None):
+    """Executa o download com múltiplas estratégias e fallback automático.
+    Se as métricas vierem de quem chamou, o registro delas fica a cargo dele."""
+    if resultado is None:
+        resultado = {}
+    metricas_proprias = metricas is None
+    if metricas_proprias:
+        metricas = MetricasJob(link, perfil_download(formato, qualidade, params_extra, trechos))
+    metricas.motor = 'api' if motor_disponivel() else 'subprocesso'
+    ctx = contexto()
+    ctx.metricas = metricas
+    ctx.dominio = dominio_de(link)
+    sucesso = False
+    _alterar_downloads_ativos(1)
+    try:
+        sucesso = _baixar_video(link, formato, qualidade, params_extra, saida, resultado, metricas, pasta, trechos)
+    finally:
+        _alterar_downloads_ativos(-1)
+        ctx.metricas = None
+        ctx.dominio = None
+        if metricas_proprias and not resultado.get('ignorado'):
+            resultado['metricas'] = registrar_metricas(metricas, sucesso)
+    return sucesso
+
+def _circuito_aberto(circuito, dominio, resultado, saida=None):
+    """Disjuntor aberto: o domínio vem falhando em vários jobs, então o job é encerrado sem
+    prender o worker (os demais jobs do domínio também falham de imediato)"""
+    pausa = circuito.bloqueado()
+    if pausa:
+        resultado['erro'] = 'rede'
+        registrar(f"\033[1;31m[!] {dominio} falhou repetidamente (circuito aberto); "
+                  f"novas tentativas liberadas em {pausa:.0f}s\033[0m", saida)
+    return bool(pausa)
+
+def _baixar_video(link, formato, qualidade, params_extra, saida, resultado, metricas, pasta=None, trechos=None):
+    estrategias = opcoes_estrategias()
+    # A estratégia que funcionou por último neste site é a primeira a ser tentada
+    dominio = dominio_de(link)
+    ordem = ordem_estrategias(dominio)
+
+    destino = pasta or PASTA_DOWNLOADS
+    formato_escolhido = False
+
+    # Consulta o índice antes de qualquer acesso à rede
+    # Um arquivo completo não serve para um pedido de trechos: só vale o perfil exato
+    perfil = perfil_download(formato, qualidade, params_extra, trechos)
+    formato_indice = None if trechos else formato
+    chaves = resultado['chaves'] = [chave_video(link)]
+    if _ja_baixado(chaves[0], perfil, formato_indice, saida, resultado):
+        return True
+
+    aceleracao = parametros_aceleracao(qualidade, params_extra)
+    if trechos:
+        # Vai junto em todas as tentativas e fallbacks, como os parâmetros de aceleração
+        aceleracao = f'{aceleracao} {argumentos_trechos(trechos)}'
+
+    # Disjuntor aberto: nem a extração chega a contatar o domínio
+    circuito = circuito_dominio(dominio)
+    if _circuito_aberto(circuito, dominio, resultado, saida):
+        return False
+
+    # Extrai os metadados uma vez com a primeira estratégia; as outras só re-extraem quando
+    # chega a vez delas, pois as opções de cada uma valem justamente para a extração
+    metricas.cache = info_em_cache(link) is not None
+    metricas.iniciar('extracao')
+    extraida_por = ordem[0]
+    try:
+        info_arquivo = obter_info(link, estrategias[ordem[0]], saida)
+    except FalhaDownload as e:
+        info_arquivo = None
+        categoria = classificar_falha(str(e))
+        if categoria in FALHAS_DOMINIO:
+            circuito.falha()
+        if categoria in FALHAS_DEFINITIVAS:
+            metricas.encerrar('extracao')
+            resultado['erro'] = categoria
+            registrar(f"\033[1;31m[!] {e}\033[0m", saida)
+            return False
+        registrar(f"\033[1;33m[•] Falha ao extrair metadados ({e}); cada tentativa fará a extração\033[0m", saida)
+    metricas.encerrar('extracao')
+
+    if info_arquivo:
+        chaves.append(chave_info(info_arquivo))
+        if _ja_baixado(chaves[-1], perfil, formato_indice, saida, resultado):
+            return True
+
+    # Confere o espaço antes de baixar e monta o arquivo na pasta de trabalho
+    try:
+        trabalho = escolher_pasta_trabalho(info_arquivo, destino, saida, trechos)
+    except FalhaDownload as e:
+        registrar(f"\033[1;31m[!] {e}\033[0m", saida)
+        return False
+    output_template = argumentos_saida(destino, trabalho, NOME_TRECHO if trechos else NOME_ARQUIVO)
 
     # Construir o comando baseado nos parâmetros
     if params_extra:
-        comando_base = f'{params_extra} -o {output_template}'
+        comando_base = f'{params_extra} {output_template}'
     elif formato == 'mp3':
-        comando_base = f'-x --audio-format mp3 --audio-quality 0 -o {output_template}'
-    elif qualidade:
-        # Verifica se o formato solicitado existe antes de tentar
-        if qualidade in ['best', '22', '18', '137+140', '135+140']:
-            comando_base = f'-f "{qualidade}+bestaudio" --merge-output-format {formato} -o {output_template}'
-        else:
-            comando_base = f'-f best -o {output_template}'
+        comando_base = f'{PARAMETROS_MP3} {output_template}'
     else:
-        comando_base = f'-f best -o {output_template}'
+        # Vídeo: o formato sai da lista de formatos já extraída, sem tentativa e erro
+        comando_base = f'{argumentos_formato(info_arquivo, qualidade, formato, saida)} {output_template}'
+    comando_base = f'{comando_base} {aceleracao}'
 
-    for tentativa, cmd in enumerate(tentativas, 1):
-        print(f"\n\033[1;35m[•] Tentativa {tentativa}/3\033[0m")
-        comando = f'{cmd} {comando_base} "{link}"'
+    # Arquivo onde o yt-dlp informa o caminho final do download
+    fd, arquivo_final = tempfile.mkstemp(prefix="wolf_", suffix=".txt")
+    os.close(fd)
+    print_arquivo = f'--print-to-file after_move:filepath "{arquivo_final}"'
 
-        try:
-            print(f"\033[1;33m[•] Executando: {comando[:120]}...\033[0m")
-            
-            # Se falhar na primeira tentativa com formato específico, tentar com fallback
-            if tentativa > 1 and qualidade and qualidade != 'best':
-                print("\033[1;33m[•] Tentando fallback para melhor qualidade disponível...\033[0m")
-                comando = f'{cmd} -f best -o {output_template} "{link}"'
-
-            resultado = subprocess.run(comando, shell=True, check=True)
-            if resultado.returncode == 0:
-                print(f"\033[1;32m[✓] Download concluído com sucesso!\033[0m")
+    posicao = repeticoes = 0
+    esperado = 0
+    formato_ajustado = False
+    try:
+        while posicao < len(ordem):
+            if job_cancelado(resultado):
+                break
+            if _circuito_aberto(circuito, dominio, resultado, saida):
+                break
+            nome = ordem[posicao]
+            cmd = estrategias[nome]
+            metricas.tentativas += 1
+            registrar(f"\n\033[1;35m[•] Tentativa {metricas.tentativas} ({nome})\033[0m", saida)
+            opcoes = f'{cmd} {comando_base}'
+
+            try:
+                if info_arquivo and extraida_por != nome:
+                    registrar(f"\033[1;34m[•] Extraindo de novo com a estratégia {nome}...\033[0m", saida)
+                    metricas.iniciar('extracao')
+                    try:
+                        info_arquivo = obter_info(link, cmd, saida, forcar=True)
+                    finally:
+                        metricas.encerrar('extracao')
+                    extraida_por = nome
+
+                # Outra estratégia: escolhe o formato de novo na lista que ela extraiu
+                # (sem lista, a seleção fica com a ordenação do yt-dlp)
+                if posicao > 0 and not params_extra and formato not in FORMATOS_SO_AUDIO and not formato_escolhido:
+                    opcoes = f'{cmd} {argumentos_formato(info_arquivo, qualidade, formato, saida)} ' \
+                             f'{output_template} {aceleracao}'
+
+                registrar(f"\033[1;33m[•] Executando: {opcoes[:120]}...\033[0m", saida)
+
+                if motor_disponivel():
+                    executar_motor(opcoes, link, saida, resultado, info_arquivo)
+                else:
+                    origem = f'--load-info-json "{info_arquivo}"' if info_arquivo else f'"{link}"'
+                    comando = f'{opcoes} {print_arquivo} {origem}'
+                    taxa = taxa_subprocesso(dominio)
+                    if taxa:
+                        comando = f'{opcoes} --limit-rate {taxa} {print_arquivo} {origem}'
+                    # Sem hooks no subprocesso: download e pós-processamento contam juntos
+                    metricas.iniciar('download')
+                    try:
+                        executar_subprocesso(comando, saida, resultado)
+                    finally:
+                        metricas.encerrar('download')
+                    with open(arquivo_final) as f:
+                        caminhos = [linha.strip() for linha in f if linha.strip()]
+                    if caminhos:
+                        resultado['arquivo'] = caminhos[-1]
+                        resultado['arquivos'] = list(dict.fromkeys(caminhos))
+                        resultado['bytes'] = metricas.bytes = sum(
+                            os.path.getsize(caminho) for caminho in resultado['arquivos'] if os.path.exists(caminho))
+
+                metricas.estrategia = nome
+                circuito.sucesso()
+                # Só a estratégia que fez a extração deste download conta como vencedora
+                if not info_arquivo or extraida_por == nome:
+                    lembrar_estrategia(dominio, nome)
+                resultado.pop('erro', None)
+                registrar(f"\033[1;32m[✓] Download concluído com sucesso!\033[0m", saida)
+                if trechos:
+                    informar_economia(info_arquivo, resultado, metricas, saida)
+                if pasta is None:
+                    if len(resultado.get('arquivos') or []) > 1:
+                        resultado['arquivos'] = [deduplicar_arquivo(arquivo, saida, metricas)
+                                                 for arquivo in resultado['arquivos']]
+                    resultado['arquivo'] = deduplicar_arquivo(resultado.get('arquivo'), saida, metricas)
+                    # Fontes intermediárias (pasta própria) são convertidas e apagadas: só a saída final é indexada
+                    registrar_no_indice(chaves, perfil, resultado.get('arquivo'), link)
                 return True
 
-        except subprocess.CalledProcessError as e:
-            # Se falhar por formato não disponível, tentar listar formatos
-            if "Requested format is not available" in str(e):
-                print("\033[1;33m[•] Formato solicitado não disponível. Listando formatos...\033[0m")
-                subprocess.run(f'yt-dlp --list-formats "{link}"', shell=True)
-                
-                # Perguntar ao usuário qual formato usar
-                novo_formato = input("\033[1;36m[?] Digite o código do formato desejado (ou Enter para melhor qualidade): \033[0m").strip()
-                if novo_formato:
-                    comando_base = f'-f "{novo_formato}+bestaudio" --merge-output-format {formato} -o {output_template}'
+            except FalhaDownload as e:
+                categoria = resultado['erro'] = classificar_falha(str(e))
+                metricas.falhas[categoria] = metricas.falhas.get(categoria, 0) + 1
+                # Formato indisponível: a estratégia funcionou, só o formato precisa mudar
+                if categoria == 'formato' and not formato_ajustado:
+                    formato_ajustado = True
+                    registrar("\033[1;33m[•] Formato solicitado não disponível. Listando formatos...\033[0m", saida)
+                    novo_formato = ""
+                    if saida is None and MODO_INTERATIVO:
+                        if info_arquivo and motor_disponivel():
+                            listar_formatos_motor(cmd, info_arquivo)
+                        elif info_arquivo:
+                            subprocess.run(f'yt-dlp --load-info-json "{info_arquivo}" --list-formats', shell=True)
+                        else:
+                            subprocess.run(f'yt-dlp --list-formats "{link}"', shell=True)
+
+                        # Perguntar ao usuário qual formato usar
+                        novo_formato = input("\033[1;36m[?] Digite o código do formato desejado (ou Enter para melhor qualidade): \033[0m").strip()
+                    formato_escolhido = bool(novo_formato)
+                    so_audio = formato in FORMATOS_SO_AUDIO
+                    if novo_formato:
+                        especificacao = f'{novo_formato}/ba/b' if so_audio else f'{novo_formato}+bestaudio/{novo_formato}'
+                    else:
+                        especificacao = 'ba/ba*/b' if so_audio else None
+                    parametros = params_extra or (PARAMETROS_MP3 if formato == 'mp3' else None)
+                    if parametros:
+                        # Áudio ou parâmetros próprios: mantém o resto (-x, capa...) e só relaxa o -f
+                        comando_base = f'{trocar_formato(parametros, especificacao)} {output_template} {aceleracao}'
+                    elif especificacao:
+                        comando_base = f'-f "{especificacao}" --merge-output-format {formato} {output_template} {aceleracao}'
+                    else:
+                        comando_base = f'{formato_flexivel(qualidade, formato)} {output_template} {aceleracao}'
                     continue
-                else:
-                    comando_base = f'-f best -o {output_template}'
+
+                registrar(f"\033[1;31m[!] Erro na tentativa {metricas.tentativas} "
+                          f"({DESCRICOES_FALHAS[categoria]}): {str(e)}\033[0m", saida)
+                if categoria in FALHAS_DOMINIO:
+                    circuito.falha()
+                if categoria in FALHAS_DEFINITIVAS:
+                    break
+                restante = BACKOFF_TOTAL_MAXIMO - esperado
+                if categoria in FALHAS_TRANSITORIAS and repeticoes < REPETICOES_TRANSITORIAS and restante > 0:
+                    # Falha passageira: repete a mesma estratégia após o backoff (limitado por job)
+                    espera = min(espera_backoff(repeticoes, categoria), restante)
+                    esperado += espera
+                    repeticoes += 1
+                    registrar(f"\033[1;33m[•] Repetindo em {espera:.1f}s "
+                              f"({repeticoes}/{REPETICOES_TRANSITORIAS})\033[0m", saida)
+                    aguardar(espera, resultado)
                     continue
-            
-            print(f"\033[1;31m[!] Erro na tentativa {tentativa}: {str(e)}\033[0m")
-        except Exception as e:
-            print(f"\033[1;31m[!] Erro inesperado na tentativa {tentativa}: {str(e)}\033[0m")
+            except Exception as e:
+                registrar(f"\033[1;31m[!] Erro inesperado na tentativa {metricas.tentativas}: {str(e)}\033[0m", saida)
+            posicao += 1
+            repeticoes = 0
+    finally:
+        os.remove(arquivo_final)
 
-    print("\033[1;31m[!] Todas as tentativas falharam. Verifique sua conexão e a URL.\033[0m")
+    if resultado.get('erro') in FALHAS_DEFINITIVAS:
+        registrar(f"\033[1;31m[!] Falha definitiva ({DESCRICOES_FALHAS[resultado['erro']]}); "
+                  f"as demais estratégias não foram tentadas.\033[0m", saida)
+    else:
+        registrar("\033[1;31m[!] Todas as tentativas falharam. Verifique sua conexão e a URL.\033[0m", saida)
     return False
 
+NOME_ARQUIVO = "%(title)s.%(ext)s"
+# Cada trecho vira um arquivo próprio, com o intervalo no nome
+NOME_TRECHO = "%(title)s [%(section_start)d-%(section_end|fim)d].%(ext)s"
+
+def argumentos_saida(destino, trabalho=None, nome=NOME_ARQUIVO):
+    """-P/-o do yt-dlp: temporários e merges na pasta de trabalho, arquivo final no destino"""
+    if trabalho:
+        return f'-P "home:{destino}" -P "temp:{trabalho}" -o "{nome}"'
+    return f'-o "{destino}/{nome}"'
+
+REGEX_INTERVALO_TEMPO = re.compile(r'^(?P<inicio>[\d:.]*)\s*-\s*(?P<fim>[\d:.]*)$')
+REGEX_TEMPO = re.compile(r'^[\d:.]+$')
+
+def segundos_tempo(texto):
+    """Converte '90', '1:30' ou '1:02:03.5' em segundos"""
+    segundos = 0.0
+    for parte in texto.split(':'):
+        segundos = segundos * 60 + float(parte)
+    return segundos
+
+def formatar_tempo(segundos):
+    """Segundos no formato h:mm:ss ou m:ss"""
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos}:{segundos:02d}"
+
+def interpretar_trechos(especificacao):
+    """Separa '1:30-4:00,10:00-,intro' em intervalos [(início, fim ou None)] e regex de capítulos;
+    lança ValueError se algum intervalo for inválido"""
+    intervalos, capitulos = [], []
+    for item in (parte.strip() for parte in especificacao.split(',')):
+        if not item:
+            continue
+        tempo = REGEX_INTERVALO_TEMPO.match(item)
+        if REGEX_TEMPO.match(item) or (tempo and not tempo['inicio'] and not tempo['fim']):
+            # Um tempo solto viraria busca de capítulo e '-' baixaria a mídia inteira
+            raise ValueError(f"Trecho sem intervalo: {item} (use início-fim, ex: 1:30-4:00 ou 10:00-)")
+        if not tempo:
+            try:
+                re.compile(item)
+            except re.error as e:
+                raise ValueError(f"Capítulo inválido: {item} ({e})") from None
+            capitulos.append(item)
+            continue
+        try:
+            inicio = segundos_tempo(tempo['inicio']) if tempo['inicio'] else 0.0
+            fim = segundos_tempo(tempo['fim']) if tempo['fim'] else None
+        except ValueError:
+            raise ValueError(f"Intervalo inválido: {item}") from None
+        if fim is not None and fim <= inicio:
+            raise ValueError(f"Intervalo vazio: {item}")
+        intervalos.append((inicio, fim))
+    if not intervalos and not capitulos:
+        raise ValueError("Nenhum trecho informado")
+    return intervalos, capitulos
+
+def argumentos_trechos(especificacao):
+    """--download-sections do yt-dlp: só os fragmentos/bytes dos trechos são baixados"""
+    intervalos, capitulos = interpretar_trechos(especificacao)
+    argumentos = [f'--download-sections "*{inicio:g}-{"inf" if fim is None else f"{fim:g}"}"'
+                  for inicio, fim in intervalos]
+    argumentos += [f'--download-sections {shlex.quote(capitulo)}' for capitulo in capitulos]
+    if CORTE_PRECISO:
+        argumentos.append('--force-keyframes-at-cuts')
+    return ' '.join(argumentos)
+
+def fracao_trechos(especificacao, info):
+    """Parte da duração coberta pelos trechos (1 se não der para calcular)"""
+    duracao = info.get('duration')
+    if not duracao:
+        return 1
+    intervalos, capitulos = interpretar_trechos(especificacao)
+    coberto = sum(min(fim or duracao, duracao) - min(inicio, duracao) for inicio, fim in intervalos)
+    for capitulo in info.get('chapters') or []:
+        if any(re.search(padrao, capitulo.get('title') or '') for padrao in capitulos):
+            coberto += capitulo['end_time'] - capitulo['start_time']
+    return min(1, coberto / duracao)
+
+def espaco_livre(pasta):
+    """Bytes livres no sistema de arquivos da pasta (None se não der para consultar)"""
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        return shutil.disk_usage(pasta).free
+    except OSError:
+        return None
+
+def ler_info(info_arquivo):
+    """Conteúdo do info JSON ({} se não der para ler)"""
+    try:
+        with open(info_arquivo) as f:
+            return json.load(f)
+    except (OSError, TypeError, ValueError):
+        return {}
+
+def tamanho_estimado(info_arquivo, trechos=None):
+    """Tamanho esperado do download segundo o info JSON (0 se desconhecido), proporcional
+    aos trechos se houver; sem filesize, estima pela taxa de bits e pela duração"""
+    info = ler_info(info_arquivo)
+    formatos = info.get('requested_formats') or [info]
+    tamanho = sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in formatos)
+    if not tamanho and info.get('duration'):
+        tamanho = int(sum(f.get('tbr') or 0 for f in formatos) * 125 * info['duration'])
+    return int(tamanho * fracao_trechos(trechos, info)) if trechos and tamanho else tamanho
+
+def tamanho_remoto(info_arquivo):
+    """Content-Length dos formatos escolhidos (0 se o servidor não informar)"""
+    info = ler_info(info_arquivo)
+    total = 0
+    for formato in info.get('requested_formats') or [info]:
+        if not formato.get('url') or not formato['url'].startswith(('http://', 'https://')):
+            return 0
+        try:
+            resposta = sessao_http().head(formato['url'], headers=formato.get('http_headers'),
+                                          allow_redirects=True, timeout=10)
+            total += int(resposta.headers.get('Content-Length') or 0) if resposta.ok else 0
+        except (requests.RequestException, ValueError):
+            return 0
+    return total
+
+def informar_economia(info_arquivo, resultado, metricas, saida=None):
+    """Compara o que os trechos custaram com o download inteiro"""
+    inteiro = tamanho_estimado(info_arquivo) or tamanho_remoto(info_arquivo)
+    baixado = resultado.get('bytes') or metricas.bytes
+    if not inteiro or not baixado:
+        return
+    resultado['economizados'] = max(0, inteiro - baixado)
+    registrar(f"\033[1;32m[✓] Trechos: {formatar_bytes(baixado)} em vez de ~{formatar_bytes(inteiro)} "
+              f"({formatar_bytes(resultado['economizados'])} economizado(s))\033[0m", saida)
+
+def escolher_pasta_trabalho(info_arquivo, destino, saida=None, trechos=None):
+    """Confere o espaço livre e decide onde o yt-dlp monta o arquivo: devolve a pasta de
+    trabalho (None = direto no destino) ou lança FalhaDownload se o arquivo não couber"""
+    necessario = tamanho_estimado(info_arquivo, trechos)
+    livre = espaco_livre(destino)
+    if livre is not None and livre < necessario + ESPACO_RESERVA:
+        raise FalhaDownload(f"Espaço insuficiente em {destino}: {formatar_bytes(livre)} livre(s), "
+                            f"~{formatar_bytes(necessario)} necessário(s)")
+    if not USAR_PASTA_TRABALHO:
+        return None
+    # Fragmentos e o arquivo juntado chegam a ocupar o dobro do tamanho final
+    livre = espaco_livre(PASTA_TRABALHO)
+    if livre is None or livre < 2 * necessario + ESPACO_RESERVA:
+        registrar("\033[1;33m[•] Pouco espaço na pasta de trabalho; baixando direto no destino\033[0m", saida)
+        return None
+    return PASTA_TRABALHO
+
+def mover_para_destino(origem, destino):
+    """Move o arquivo pronto para o destino numa única cópia sequencial"""
+    try:
+        os.replace(origem, destino)
+        return
+    except OSError:
+        pass
+    # Outro sistema de arquivos (ex: /sdcard): copia para .part e renomeia no destino
+    temporario = destino + '.part'
+    try:
+        shutil.copyfile(origem, temporario)
+        os.replace(temporario, destino)
+    except BaseException:
+        _remover_silencioso(temporario)
+        raise
+    os.remove(origem)
+
+def _prefixo_temporario(caminho):
+    """Título comum aos .part, fragmentos e formatos separados de um download"""
+    encontrado = re.match(r'(.*?)(?:\.f[\w-]+)?\.\w+(?:\.part)?$', os.path.basename(caminho))
+    return encontrado.group(1) + '.' if encontrado else os.path.basename(caminho)
+
+def limpar_temporarios():
+    """Remove temporários abandonados nas pastas internas do Wolf (trabalho e fontes de áudio),
+    preservando os que pertencem a jobs pendentes da fila. Devolve (arquivos, bytes).
+    O destino não é tocado: um download avulso interrompido deixa lá o .part que o yt-dlp retoma."""
+    try:
+        registrados = [caminho for linha in banco().execute(
+            "SELECT arquivo_parcial, arquivo FROM fila WHERE estado IN ('pendente', 'executando')")
+            for caminho in linha if caminho]
+    except sqlite3.Error:
+        return 0, 0
+    # O .part de um job de áudio fica na pasta de trabalho e a fonte já baixada em PASTA_FONTES:
+    # nas pastas internas vale o nome registrado, não a pasta em que ele foi visto
+    exatos = {os.path.abspath(caminho) for caminho in registrados}
+    prefixos = {_prefixo_temporario(caminho) for caminho in registrados}
+    limite = time() - IDADE_TEMPORARIOS_ORFAOS
+    removidos = liberados = 0
+
+    for pasta in (PASTA_TRABALHO, PASTA_FONTES):
+        try:
+            entradas = list(os.scandir(pasta))
+        except OSError:
+            continue
+        for entrada in entradas:
+            if not entrada.is_file(follow_symlinks=False):
+                continue
+            if os.path.abspath(entrada.path) in exatos:
+                continue
+            if any(entrada.name.startswith(prefixo) for prefixo in prefixos):
+                continue
+            try:
+                estado = entrada.stat()
+                if estado.st_mtime > limite:
+                    continue
+                os.remove(entrada.path)
+            except OSError:
+                continue
+            removidos += 1
+            liberados += estado.st_size
+    return removidos, liberados
+
+def _ja_baixado(chave, perfil, formato, saida, resultado):
+    """Verifica no índice se o vídeo já foi baixado nesse formato"""
+    registro = consultar_indice(chave, perfil, formato)
+    if registro is None:
+        return False
+    registrar(f"\033[1;32m[✓] Já baixado anteriormente: {registro['arquivo']}\033[0m", saida)
+    resultado['arquivo'] = registro['arquivo']
+    resultado['ignorado'] = True
+    return True
+
+_conversor = None
+_conversor_workers = 0
+_conversor_lock = threading.Lock()
+# O limite de conversões muda com o ajuste automático: o pool não é trocado, quem segura é esta condição
+_conversoes_ativas = 0
+_conversoes_livres = threading.Condition()
+
+def _ler_texto(caminho):
+    try:
+        with open(caminho) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def nucleos_disponiveis():
+    """Núcleos que o processo pode usar (o Android costuma reservar alguns)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+def memoria_disponivel():
+    """(disponível, total) em bytes pelo /proc/meminfo; (None, None) se não der para ler"""
+    campos = {}
+    for linha in (_ler_texto('/proc/meminfo') or '').splitlines():
+        nome, _, valor = linha.partition(':')
+        partes = valor.split()
+        if len(partes) == 2 and partes[0].isdigit() and partes[1] == 'kB':
+            campos[nome] = int(partes[0]) * 1024
+    return campos.get('MemAvailable'), campos.get('MemTotal')
+
+_termux_bateria = True   # vira False se o termux-battery-status falhar (Termux:API ausente)
+
+def estado_bateria():
+    """{'nivel', 'carregando', 'temperatura'} pelo sysfs ou pelo termux-battery-status
+    (o Android costuma bloquear o sysfs); None se não houver bateria"""
+    global _termux_bateria
+    pasta_base = '/sys/class/power_supply'
+    for nome in sorted(os.listdir(pasta_base)) if os.path.isdir(pasta_base) else []:
+        pasta = os.path.join(pasta_base, nome)
+        nivel = _ler_texto(os.path.join(pasta, 'capacity'))
+        if _ler_texto(os.path.join(pasta, 'type')) != 'Battery' or not (nivel or '').isdigit():
+            continue
+        temperatura = _ler_texto(os.path.join(pasta, 'temp'))
+        return {'nivel': int(nivel),
+                'carregando': _ler_texto(os.path.join(pasta, 'status')) in ('Charging', 'Full'),
+                'temperatura': int(temperatura) / 10 if (temperatura or '').lstrip('-').isdigit() else None}
+    if _termux_bateria and shutil.which('termux-battery-status'):
+        try:
+            processo = subprocess.run(['termux-battery-status'], capture_output=True, text=True, timeout=5)
+            dados = json.loads(processo.stdout)
+            return {'nivel': int(dados['percentage']),
+                    'carregando': dados.get('plugged', 'UNPLUGGED') != 'UNPLUGGED',
+                    'temperatura': dados.get('temperature')}
+        except (OSError, subprocess.SubprocessError, ValueError, KeyError, TypeError):
+            _termux_bateria = False
+    return None
+
+def temperatura_cpu():
+    """Maior temperatura das zonas térmicas em °C (None se o sysfs não informar)"""
+    pasta_base = '/sys/class/thermal'
+    temperaturas = []
+    for nome in os.listdir(pasta_base) if os.path.isdir(pasta_base) else []:
+        valor = _ler_texto(os.path.join(pasta_base, nome, 'temp')) if nome.startswith('thermal_zone') else None
+        if (valor or '').isdigit() and 0 < int(valor) / 1000 < 150:
+            temperaturas.append(int(valor) / 1000)
+    return max(temperaturas) if temperaturas else None
+
+_dispositivo_lock = threading.Lock()
+
+def _medidas_dispositivo():
+    try:
+        with open(ARQUIVO_DISPOSITIVO) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def velocidade_escrita(pasta, medir=True):
+    """Bytes/s de escrita (com fsync) na pasta; a medida vale por INTERVALO_ATUALIZACAO.
+    Com medir=False devolve a última medida salva, mesmo vencida (None se não houver)."""
+    medida = _medidas_dispositivo().get(pasta)
+    if medida and (not medir or time() - medida['medido_em'] < INTERVALO_ATUALIZACAO):
+        return medida['escrita']
+    if not medir:
+        return None
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        fd, caminho = tempfile.mkstemp(dir=pasta, suffix=".teste")
+    except OSError:
+        return None
+    bloco = os.urandom(1024 * 1024)
+    try:
+        inicio = time()
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(TAMANHO_TESTE_ESCRITA // len(bloco)):
+                f.write(bloco)
+            f.flush()
+            os.fsync(f.fileno())
+        escrita = int(TAMANHO_TESTE_ESCRITA / max(time() - inicio, 0.001))
+    except OSError:
+        return None
+    finally:
+        _remover_silencioso(caminho)
+    # Gravação atômica: o monitor e os downloads leem o arquivo a qualquer momento
+    with _dispositivo_lock:
+        medidas = _medidas_dispositivo()
+        medidas[pasta] = {'escrita': escrita, 'medido_em': time()}
+        try:
+            os.makedirs(PASTA_WOLF, exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=PASTA_WOLF, suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(medidas, f, indent=2)
+            os.replace(temporario, ARQUIVO_DISPOSITIVO)
+        except OSError:
+            pass
+    return escrita
+
+class MonitorRecursos:
+    """Amostra o aparelho (no máximo a cada INTERVALO_AMOSTRAGEM segundos) e decide quantos
+    downloads, fragmentos, conversões e threads do ffmpeg ele aguenta no momento"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.amostra = None
+        self.amostrado_em = 0
+        self.amostrando = False
+
+    def _coletar(self, completa=True):
+        """Leituras do aparelho; completa=False pula o termux-battery-status e o teste de escrita"""
+        try:
+            carga = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            carga = None
+        memoria, memoria_total = memoria_disponivel()
+        return {
+            'nucleos': nucleos_disponiveis(), 'carga': carga,
+            'memoria': memoria, 'memoria_total': memoria_total,
+            'bateria': estado_bateria() if completa else None, 'temperatura_cpu': temperatura_cpu(),
+            'escrita': velocidade_escrita(PASTA_TRABALHO if USAR_PASTA_TRABALHO else PASTA_DOWNLOADS, medir=completa),
+        }
+
+    def amostrar(self, forcar=False):
+        """Amostra completa, que pode levar segundos: roda na thread de fundo ou a pedido do usuário"""
+        with self.lock:
+            if not forcar and self.amostra is not None and time() - self.amostrado_em <= INTERVALO_AMOSTRAGEM:
+                return self.amostra
+        amostra = self._coletar()
+        with self.lock:
+            self.amostra, self.amostrado_em = amostra, time()
+        return amostra
+
+    def _renovar(self):
+        try:
+            self.amostrar(forcar=True)
+        finally:
+            with self.lock:
+                self.amostrando = False
+
+    def atual(self):
+        """Última amostra sem bloquear os downloads: se vencida, é renovada numa thread de fundo"""
+        with self.lock:
+            amostra = self.amostra
+            renovar = not self.amostrando and (amostra is None or time() - self.amostrado_em > INTERVALO_AMOSTRAGEM)
+            if renovar:
+                self.amostrando = True
+        if renovar:
+            threading.Thread(target=self._renovar, name="monitor-recursos", daemon=True).start()
+        if amostra is None:
+            # Antes da primeira amostra completa: só as leituras baratas e a última escrita medida
+            amostra = self._coletar(completa=False)
+        return amostra
+
+    def ajuste(self):
+        """{'downloads', 'fragmentos', 'conversoes', 'threads', 'motivos'}; downloads e
+        fragmentos None = sem limite além do configurado"""
+        amostra = self.atual()
+        downloads = fragmentos = None
+        motivos = []
+        nucleos = amostra['nucleos']
+        livres = nucleos if amostra['carga'] is None else max(1, min(nucleos, round(nucleos - amostra['carga'])))
+        if livres <= nucleos / 2 and amostra['carga']:
+            motivos.append(f"CPU ocupada (carga {amostra['carga']:.1f})")
+        # Cada ffmpeg com algumas threads rende mais que muitos processos de uma thread
+        conversoes = max(1, livres // 2)
+        threads = max(1, livres // conversoes)
+
+        if amostra['memoria'] is not None:
+            downloads = max(1, amostra['memoria'] // MEMORIA_POR_DOWNLOAD)
+            if amostra['memoria'] < MEMORIA_BAIXA:
+                fragmentos, conversoes = 2, 1
+                motivos.append(f"pouca memória ({formatar_bytes(amostra['memoria'])})")
+
+        bateria = amostra['bateria']
+        if bateria and not bateria['carregando']:
+            if bateria['nivel'] <= BATERIA_CRITICA:
+                downloads, fragmentos, conversoes, threads = 1, 2, 1, 1
+                motivos.append(f"bateria em {bateria['nivel']}%")
+            elif bateria['nivel'] <= BATERIA_BAIXA:
+                conversoes = max(1, conversoes // 2)
+                motivos.append(f"bateria em {bateria['nivel']}% sem carregar")
+
+        for origem, temperatura in (('bateria', (bateria or {}).get('temperatura')),
+                                    ('cpu', amostra['temperatura_cpu'])):
+            quente, critica = TEMPERATURAS_LIMITE[origem]
+            if temperatura is None or temperatura < quente:
+                continue
+            conversoes, threads = 1, max(1, threads // 2)
+            if temperatura >= critica:
+                downloads, fragmentos = 1, min(fragmentos or 2, 2)
+            motivos.append(f"{origem} a {temperatura:.0f}°C")
+            break
+
+        if amostra['escrita'] is not None and amostra['escrita'] < ESCRITA_LENTA:
+            downloads = min(downloads or 2, 2)
+            fragmentos = min(fragmentos or 4, 4)
+            motivos.append(f"armazenamento lento ({formatar_bytes(amostra['escrita'])}/s)")
+
+        return {'downloads': downloads, 'fragmentos': fragmentos, 'conversoes': conversoes,
+                'threads': threads, 'motivos': motivos}
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+def monitor_recursos():
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = MonitorRecursos()
+        return _monitor
+
+def ajuste_dispositivo():
+    return monitor_recursos().ajuste()
+
+def downloads_simultaneos(pedidos):
+    """Downloads simultâneos que o aparelho aguenta agora (no máximo os pedidos)"""
+    if not AJUSTE_AUTOMATICO:
+        return pedidos
+    limite = ajuste_dispositivo()['downloads']
+    return min(pedidos, limite) if limite else pedidos
+
+def threads_ffmpeg():
+    """Threads por processo ffmpeg (None = deixa o ffmpeg decidir)"""
+    return ajuste_dispositivo()['threads'] if AJUSTE_AUTOMATICO else None
+
+def conversoes_simultaneas():
+    if MAX_CONVERSOES_SIMULTANEAS:
+        return MAX_CONVERSOES_SIMULTANEAS
+    return ajuste_dispositivo()['conversoes'] if AJUSTE_AUTOMATICO else os.cpu_count() or 1
+
+def estagio_conversao():
+    """Pool do estágio de conversão. Só cresce (se o limite passar do tamanho atual);
+    quantos ffmpeg rodam ao mesmo tempo é decidido por _converter_no_limite."""
+    global _conversor, _conversor_workers
+    with _conversor_lock:
+        workers = conversoes_simultaneas()
+        if _conversor is None or workers > _conversor_workers:
+            # Um pool antigo termina o que já tem na fila, ainda sob o mesmo limite
+            if _conversor is not None:
+                _conversor.shutdown(wait=False)
+            _conversor_workers = max(workers, os.cpu_count() or 1)
+            _conversor = ThreadPoolExecutor(max_workers=_conversor_workers, thread_name_prefix="conversao")
+        return _conversor
+
+def _converter_no_limite(funcao, *args):
+    """Roda a conversão assim que houver vaga sob o limite atual de conversões simultâneas"""
+    global _conversoes_ativas
+    with _conversoes_livres:
+        # Reavalia de tempos em tempos: o ajuste automático pode subir o limite sem avisar
+        while _conversoes_ativas >= conversoes_simultaneas():
+            _conversoes_livres.wait(timeout=5)
+        _conversoes_ativas += 1
+    try:
+        return funcao(*args)
+    finally:
+        with _conversoes_livres:
+            _conversoes_ativas -= 1
+            _conversoes_livres.notify_all()
+
+def alvos_audio(escolha):
+    """Converte uma escolha como '1,3' em chaves de FORMATOS_AUDIO (None se inválida)"""
+    alvos = []
+    for chave in escolha.replace(' ', '').split(','):
+        if chave not in FORMATOS_AUDIO:
+            return None
+        if chave not in alvos:
+            alvos.append(chave)
+    return alvos
+
+def parametros_fonte(alvos):
+    """Parâmetros do yt-dlp para baixar o áudio original, sem conversão"""
+    params = '-f bestaudio/best'
+    if any(FORMATOS_AUDIO[alvo].get('capa') for alvo in alvos):
+        params += ' --write-thumbnail --convert-thumbnails jpg --embed-metadata'
+    return params
+
+def codec_audio(arquivo):
+    """Codec da primeira faixa de áudio do arquivo (via ffprobe)"""
+    if not shutil.which("ffprobe"):
+        return None
+    resultado = subprocess.run(["ffprobe", "-v", "quiet", "-select_streams", "a:0",
+                                "-show_entries", "stream=codec_name", "-of", "csv=p=0", arquivo],
+                               capture_output=True, text=True)
+    return resultado.stdout.strip() or None if resultado.returncode == 0 else None
+
+def comando_conversao(fonte, alvo, destino, codec=None, capa=None):
+    """Monta o comando ffmpeg que converte a fonte para o formato de áudio escolhido"""
+    formato = FORMATOS_AUDIO[alvo]
+    comando = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-i', fonte]
+    if capa:
+        comando += ['-i', capa, '-map', '0:a', '-map', '1:0', '-c:v', 'mjpeg', '-disposition:v', 'attached_pic']
+    else:
+        comando += ['-map', '0:a']
+    comando += ['-map_metadata', '0']
+    if codec and codec == formato.get('copia'):
+        comando += ['-c:a', 'copy']
+    else:
+        comando += shlex.split(formato['ffmpeg'])
+        threads = threads_ffmpeg()
+        if threads:
+            comando += ['-threads', str(threads)]
+    return comando + ['-f', formato['muxer'], destino]
+
+def baixar_audio(link, alvos, saida=None, resultado=None, trechos=None):
+    """Baixa o áudio original uma única vez (ou só os trechos pedidos) e envia a conversão
+    para cada formato escolhido ao estágio de conversão. Devolve um Future com o sucesso do job."""
+    if resultado is None:
+        resultado = {}
+    futuro = Future()
+
+    chave = chave_video(link)
+    pendentes = []
+    for alvo in alvos:
+        formato = FORMATOS_AUDIO[alvo]
+        registro = consultar_indice(chave, perfil_download(formato['code'], None, formato['params'], trechos),
+                                    None if trechos else formato['code'])
+        if registro is None:
+            pendentes.append(alvo)
+        else:
+            registrar(f"\033[1;32m[✓] Já baixado anteriormente: {registro['arquivo']}\033[0m", saida)
+            resultado['arquivo'] = resultado.get('arquivo') or registro['arquivo']
+    if not pendentes:
+        resultado['ignorado'] = True
+        futuro.set_result(True)
+        return futuro
+
+    metricas = MetricasJob(link, perfil_download('audio', ','.join(alvos), trechos=trechos))
+    resultado.pop('arquivos', None)
+    sucesso = baixar_video(link, 'audio', None, parametros_fonte(pendentes), saida, resultado,
+                           pasta=PASTA_FONTES, metricas=metricas, trechos=trechos)
+    # A fonte pode ter ficado de uma execução interrompida antes da conversão (o yt-dlp a reaproveita)
+    resultado.pop('ignorado', None)
+    # Com trechos, cada um chega como uma fonte própria
+    fontes = [fonte for fonte in resultado.get('arquivos') or [resultado.get('arquivo')]
+              if fonte and os.path.exists(fonte)]
+    if not sucesso or not fontes:
+        resultado['metricas'] = registrar_metricas(metricas, False)
+        futuro.set_result(False)
+        return futuro
+    if resultado.get('job_id'):
+        # Protege a fonte da limpeza de temporários até a conversão terminar
+        atualizar_job(resultado['job_id'], arquivo=fontes[0])
+
+    registrar(f"\033[1;34m[•] Conversão para {len(pendentes)} formato(s) enviada ao estágio de conversão\033[0m",
+              saida)
+    return estagio_conversao().submit(_converter_no_limite, _converter_fonte, link, fontes, pendentes, resultado,
+                                      metricas, trechos)
+
+def _converter_fonte(link, fontes, alvos, resultado, metricas, trechos=None):
+    """Converte cada fonte baixada para cada formato (roda no estágio de conversão)"""
+    saida = open(resultado['log'], 'a') if resultado.get('log') else None
+    arquivos = []
+    sucesso = True
+    try:
+        os.makedirs(PASTA_DOWNLOADS, exist_ok=True)
+        os.makedirs(PASTA_TRABALHO, exist_ok=True)
+        for fonte in fontes:
+            base = os.path.splitext(os.path.basename(fonte))[0]
+            capa = os.path.splitext(fonte)[0] + '.jpg'
+            codec = codec_audio(fonte)
+            for alvo in alvos:
+                if job_cancelado(resultado):
+                    sucesso = False
+                    break
+                formato = FORMATOS_AUDIO[alvo]
+                nome = f"{base}.{formato['ext']}"
+                if any(os.path.basename(arquivo) == nome for arquivo in arquivos):
+                    nome = f"{base} ({alvo}).{formato['ext']}"
+                destino = os.path.join(PASTA_DOWNLOADS, nome)
+                temporario = os.path.join(PASTA_TRABALHO if USAR_PASTA_TRABALHO else PASTA_DOWNLOADS,
+                                          nome + '.part')
+                comando = comando_conversao(fonte, alvo, temporario, codec,
+                                            capa if formato.get('capa') and os.path.exists(capa) else None)
+                registrar(f"\033[1;34m[•] Convertendo para {formato['code']}: {nome}\033[0m", saida)
+                inicio = time()
+                try:
+                    subprocess.run(comando, check=True, capture_output=True, text=True)
+                except (OSError, subprocess.CalledProcessError) as e:
+                    erro = (getattr(e, 'stderr', None) or str(e)).strip().splitlines()
+                    registrar(f"\033[1;31m[!] Falha ao converter para {formato['code']}: "
+                              f"{erro[-1] if erro else e}\033[0m", saida)
+                    _remover_silencioso(temporario)
+                    sucesso = False
+                    continue
+                finally:
+                    metricas.adicionar('conversao_audio', time() - inicio)
+                mover_para_destino(temporario, destino)
+                destino = deduplicar_arquivo(destino, saida, metricas)
+                registrar_no_indice(resultado.get('chaves') or [chave_video(link)],
+                                    perfil_download(formato['code'], None, formato['params'], trechos), destino, link)
+                arquivos.append(destino)
+                registrar(f"\033[1;32m[✓] Convertido: {destino}\033[0m", saida)
+    except Exception as e:
+        registrar(f"\033[1;31m[!] Erro inesperado na conversão: {e}\033[0m", saida)
+        sucesso = False
+    finally:
+        if saida is not None:
+            saida.close()
+
+    if sucesso:
+        for fonte in fontes:
+            _remover_silencioso(fonte)
+            _remover_silencioso(os.path.splitext(fonte)[0] + '.jpg')
+    resultado['arquivos'] = arquivos
+    if arquivos:
+        resultado['arquivo'] = arquivos[0]
+    resultado['metricas'] = registrar_metricas(metricas, sucesso)
+    return sucesso
+
+def _ler_taxa(mensagem):
+    """Lê um limite em KB/s (0 = sem limite); devolve bytes/s ou None se inválido"""
+    valor = input(f"\033[1;36m{mensagem} (KB/s, 0 = sem limite): \033[0m").strip()
+    if not valor.isdigit():
+        print("\033[1;31m[!] Valor inválido.\033[0m")
+        return None
+    return int(valor) * 1024
+
+def _descrever_taxa(taxa):
+    return f"{taxa // 1024} KB/s" if taxa else "sem limite"
+
+def mostrar_menu_banda():
+    """Menu de limites de banda (global, por domínio e por horário)"""
+    global LIMITE_GLOBAL, LIMITE_POR_HOST
+    while True:
+        clear_screen()
+        print(f"""\033[1;36m
+╔════════════════════════════════════════╗
+║           📶 LIMITES DE BANDA          ║
+╚════════════════════════════════════════╝\033[0m
+\033[1;33m Limite atual em vigor: {_descrever_taxa(limite_global_atual())}\033[0m
+ 1. Limite global: {_descrever_taxa(LIMITE_GLOBAL)}
+ 2. Limite por domínio (padrão): {_descrever_taxa(LIMITE_POR_HOST)}
+ 3. Limites de um domínio específico""")
+        for dominio, limites in LIMITES_DOMINIOS.items():
+            print(f"      • {dominio}: {_descrever_taxa(limites.get('taxa', 0))}, "
+                  f"{limites.get('conexoes', MAX_POR_HOST)} conexão(ões)")
+        print(" 4. Adicionar janela de horário")
+        for janela in AGENDA_LIMITES:
+            print(f"      • {janela['inicio']}-{janela['fim']}: {_descrever_taxa(janela['taxa'])}")
+        print(" 5. Limpar janelas de horário\n 0. Voltar")
+
+        opcao = input("\n\033[1;36m📶 Escolha uma opção: \033[0m").strip()
+        if opcao == "0":
+            break
+        elif opcao == "1":
+            taxa = _ler_taxa("Limite global")
+            if taxa is not None:
+                LIMITE_GLOBAL = taxa
+        elif opcao == "2":
+            taxa = _ler_taxa("Limite por domínio")
+            if taxa is not None:
+                LIMITE_POR_HOST = taxa
+        elif opcao == "3":
+            dominio = dominio_de("//" + input("\033[1;36mDomínio (ex: youtube.com): \033[0m").strip())
+            taxa = _ler_taxa(f"Limite para {dominio}")
+            conexoes = input("\033[1;36mConexões simultâneas (Enter = padrão, 0 = remover domínio): \033[0m").strip()
+            if not dominio or taxa is None:
+                continue
+            if conexoes == "0":
+                LIMITES_DOMINIOS.pop(dominio, None)
+            else:
+                LIMITES_DOMINIOS[dominio] = {'taxa': taxa}
+                if conexoes.isdigit():
+                    LIMITES_DOMINIOS[dominio]['conexoes'] = int(conexoes)
+        elif opcao == "4":
+            inicio = input("\033[1;36mInício (HH:MM): \033[0m").strip()
+            fim = input("\033[1;36mFim (HH:MM): \033[0m").strip()
+            taxa = _ler_taxa("Limite nesse horário")
+            if taxa is None or not all(re.fullmatch(r'\d{2}:\d{2}', h) for h in (inicio, fim)):
+                print("\033[1;31m[!] Horário inválido.\033[0m")
+                sleep(1)
+                continue
+            AGENDA_LIMITES.append({'inicio': inicio, 'fim': fim, 'taxa': taxa})
+        elif opcao == "5":
+            AGENDA_LIMITES.clear()
+        else:
+            print("\033[1;31m[!] Opção inválida. Tente novamente.\033[0m")
+            sleep(1)
+            continue
+        salvar_config()
+
+def mostrar_menu_duplicados():
+    """Menu de duplicados: ação pós-download e varredura da biblioteca"""
+    global DEDUPLICACAO
+    descricoes = {'link': '🔗 hardlink (ou remove a cópia)', 'remover': '🗑  remove a cópia',
+                  'desativado': '❌ desativado'}
+    while True:
+        clear_screen()
+        print(f"""\033[1;36m
+╔════════════════════════════════════════╗
+║           ♻️  ARQUIVOS DUPLICADOS        ║
+╚════════════════════════════════════════╝\033[0m
+ 1. Ação para conteúdo idêntico: {descricoes[DEDUPLICACAO]}
+ 2. Procurar duplicados em {PASTA_DOWNLOADS}
+ 0. Voltar""")
+        opcao = input("\n\033[1;36m♻️ Escolha uma opção: \033[0m").strip()
+        if opcao == "0":
+            break
+        elif opcao == "1":
+            DEDUPLICACAO = ACOES_DEDUPLICACAO[(ACOES_DEDUPLICACAO.index(DEDUPLICACAO) + 1) % len(ACOES_DEDUPLICACAO)]
+            salvar_config()
+        elif opcao == "2":
+            grupos = escanear_biblioteca()
+            recuperaveis = sum(estado.st_size for _, *duplicados in grupos for _, estado in duplicados)
+            for original, *duplicados in grupos[:10]:
+                print(f"\033[1;33m    • {original[0]}\033[0m")
+                for caminho, _ in duplicados:
+                    print(f"\033[1;34m        = {caminho}\033[0m")
+            if len(grupos) > 10:
+                print(f"\033[1;33m    ... e mais {len(grupos) - 10} grupo(s)\033[0m")
+            print(f"\033[1;32m[✓] {len(grupos)} grupo(s) de duplicados, "
+                  f"{formatar_bytes(recuperaveis)} recuperáveis\033[0m")
+            if grupos and DEDUPLICACAO != 'desativado':
+                resposta = input(f"\033[1;36m[?] Aplicar '{DEDUPLICACAO}' nas cópias (o arquivo mais antigo fica)? "
+                                 f"[s/N]: \033[0m").strip().lower()
+                if resposta in ('s', 'sim'):
+                    quantidade, economizados = aplicar_deduplicacao(grupos)
+                    print(f"\033[1;32m[✓] {quantidade} cópia(s) tratada(s), "
+                          f"{formatar_bytes(economizados)} liberados\033[0m")
+            input("\n\033[1;36mPressione Enter para continuar...\033[0m")
+        else:
+            print("\033[1;31m[!] Opção inválida. Tente novamente.\033[0m")
+            sleep(1)
+
+def descrever_ajuste(ajuste):
+    """Resumo em uma linha dos limites escolhidos pelo ajuste automático"""
+    downloads = min(MAX_DOWNLOADS_SIMULTANEOS, ajuste['downloads'] or MAX_DOWNLOADS_SIMULTANEOS)
+    fragmentos = f"até {ajuste['fragmentos']} fragmento(s)" if ajuste['fragmentos'] else "fragmentos do perfil"
+    conversoes = MAX_CONVERSOES_SIMULTANEAS or ajuste['conversoes']
+    return (f"{downloads} download(s), {fragmentos}, {conversoes} conversão(ões) × "
+            f"{ajuste['threads']} thread(s) do ffmpeg" + (f" — {', '.join(ajuste['motivos'])}" if ajuste['motivos'] else ""))
+
+def mostrar_recursos_dispositivo():
+    """Leituras atuais do aparelho e os limites que o ajuste automático tira delas"""
+    amostra = monitor_recursos().amostrar(forcar=True)
+    bateria = amostra['bateria']
+    carga = f"carga {amostra['carga']:.2f}" if amostra['carga'] is not None else "carga desconhecida"
+    memoria = (f"{formatar_bytes(amostra['memoria'])} livre(s) de {formatar_bytes(amostra['memoria_total'])}"
+               if amostra['memoria'] is not None else "desconhecida")
+    if bateria:
+        estado = "carregando" if bateria['carregando'] else "na bateria"
+        temperatura = f", {bateria['temperatura']:.0f}°C" if bateria.get('temperatura') is not None else ""
+        bateria = f"{bateria['nivel']}% ({estado}{temperatura})"
+    print(f"""\033[1;36m
+[•] CPU: {amostra['nucleos']} núcleo(s), {carga}
+[•] Memória: {memoria}
+[•] Bateria: {bateria or 'não encontrada'}
+[•] Temperatura da CPU: {f"{amostra['temperatura_cpu']:.0f}°C" if amostra['temperatura_cpu'] else 'desconhecida'}
+[•] Escrita em {PASTA_TRABALHO if USAR_PASTA_TRABALHO else PASTA_DOWNLOADS}: {f"{formatar_bytes(amostra['escrita'])}/s" if amostra['escrita'] else 'desconhecida'}
+[•] Ajuste: {descrever_ajuste(monitor_recursos().ajuste())}\033[0m""")
+
 def mostrar_menu_config():
-    global ATUALIZAR_COOKIES_AUTO
+    global ATUALIZAR_COOKIES_AUTO, MAX_DOWNLOADS_SIMULTANEOS, MAX_POR_HOST, PERFIL_ACELERACAO
+    global MAX_CONVERSOES_SIMULTANEAS, USAR_PASTA_TRABALHO, CORTE_PRECISO, AJUSTE_AUTOMATICO
     while True:
         clear_screen()
         print("""\033[1;36m
@@ -466,9 +3619,24 @@ def mostrar_menu_config():
 ╠════════════════════════════════════════╣
 ║ 1. {} Atualização automática de cookies║
 ║ 2. ⚡ Instalar todas as dependências   ║
+║ 3. 📂 Downloads simultâneos: {:<2}        ║
+║ 4. 🌐 Downloads por host: {:<2}           ║
+║ 5. 🗂  Reconstruir índice de downloads  ║
+║ 6. 🚀 Aceleração: {:<10}           ║
+║ 7. 📶 Limites de banda                 ║
+║ 8. 🎛  Conversões simultâneas: {:<6}  ║
+║ 9. {} Pasta de trabalho interna       ║
+║10. ♻️  Arquivos duplicados: {:<10} ║
+║11. {} Corte preciso de trechos        ║
+║12. {} Ajuste automático ao aparelho   ║
 ║ 0. 🔙 Voltar ao menu principal         ║
 ╚════════════════════════════════════════╝
-\033[0m""".format("✅" if ATUALIZAR_COOKIES_AUTO else "❌"))
+\033[0m""".format("✅" if ATUALIZAR_COOKIES_AUTO else "❌", MAX_DOWNLOADS_SIMULTANEOS, MAX_POR_HOST,
+                  PERFIL_ACELERACAO, MAX_CONVERSOES_SIMULTANEAS or "auto",
+                  "✅" if USAR_PASTA_TRABALHO else "❌", DEDUPLICACAO, "✅" if CORTE_PRECISO else "❌",
+                  "✅" if AJUSTE_AUTOMATICO else "❌"))
+        if AJUSTE_AUTOMATICO:
+            print(f"\033[1;34m[•] Ajuste atual: {descrever_ajuste(ajuste_dispositivo())}\033[0m")
 
         opcao = input("\n\033[1;36m⚙️ Escolha uma opção: \033[0m").strip()
 
@@ -478,10 +3646,79 @@ def mostrar_menu_config():
             ATUALIZAR_COOKIES_AUTO = not ATUALIZAR_COOKIES_AUTO
             status = "ativada" if ATUALIZAR_COOKIES_AUTO else "desativada"
             print(f"\033[1;32m[✓] Atualização automática de cookies {status}\033[0m")
+            salvar_config()
             sleep(1)
         elif opcao == "2":
-            instalar_dependencias_auto()
+            if instalar_dependencias_auto():
+                salvar_impressao_ambiente(atualizado=True)
             input("\n\033[1;36mPressione Enter para continuar...\033[0m")
+        elif opcao == "5":
+            reconstruir_indice()
+            input("\n\033[1;36mPressione Enter para continuar...\033[0m")
+        elif opcao == "7":
+            mostrar_menu_banda()
+        elif opcao == "10":
+            mostrar_menu_duplicados()
+        elif opcao == "12":
+            mostrar_recursos_dispositivo()
+            resposta = input(f"\n\033[1;36m🔋 {'Desativar' if AJUSTE_AUTOMATICO else 'Ativar'} "
+                             f"o ajuste automático? (s/N): \033[0m").strip().lower()
+            if resposta == 's':
+                AJUSTE_AUTOMATICO = not AJUSTE_AUTOMATICO
+                salvar_config()
+                status = "ativado" if AJUSTE_AUTOMATICO else "desativado"
+                print(f"\033[1;32m[✓] Ajuste automático {status}\033[0m")
+                sleep(1)
+        elif opcao == "11":
+            CORTE_PRECISO = not CORTE_PRECISO
+            if CORTE_PRECISO:
+                print("\033[1;32m[✓] Trechos cortados no ponto exato (recodifica as pontas)\033[0m")
+            else:
+                print("\033[1;32m[✓] Trechos cortados sem recodificar (no keyframe mais próximo)\033[0m")
+            salvar_config()
+            sleep(1)
+        elif opcao == "9":
+            USAR_PASTA_TRABALHO = not USAR_PASTA_TRABALHO
+            if USAR_PASTA_TRABALHO:
+                print(f"\033[1;32m[✓] Downloads montados em {PASTA_TRABALHO} e movidos ao final\033[0m")
+            else:
+                print("\033[1;32m[✓] Downloads gravados direto na pasta de downloads\033[0m")
+            salvar_config()
+            sleep(1)
+        elif opcao == "8":
+            valor = input(f"\n\033[1;36m🔢 Conversões simultâneas (0 = auto, {os.cpu_count() or 1} núcleo(s)): \033[0m").strip()
+            if valor.isdigit():
+                MAX_CONVERSOES_SIMULTANEAS = int(valor)
+                salvar_config()
+                print("\033[1;32m[✓] Configuração atualizada\033[0m")
+            else:
+                print("\033[1;31m[!] Valor inválido.\033[0m")
+            sleep(1)
+        elif opcao == "6":
+            nomes = list(PERFIS_ACELERACAO)
+            for i, nome in enumerate(nomes, 1):
+                marcador = "•" if nome == PERFIL_ACELERACAO else " "
+                print(f"\033[1;36m {marcador} {i}. {nome:<10} {PERFIS_ACELERACAO[nome]['desc']}\033[0m")
+            escolha = input("\n\033[1;36m🚀 Escolha o perfil: \033[0m").strip()
+            if escolha.isdigit() and 1 <= int(escolha) <= len(nomes):
+                PERFIL_ACELERACAO = nomes[int(escolha) - 1]
+                salvar_config()
+                print(f"\033[1;32m[✓] Perfil de aceleração: {PERFIL_ACELERACAO}\033[0m")
+            else:
+                print("\033[1;31m[!] Opção inválida.\033[0m")
+            sleep(1)
+        elif opcao in ["3", "4"]:
+            valor = input("\n\033[1;36m🔢 Novo valor: \033[0m").strip()
+            if valor.isdigit() and int(valor) > 0:
+                if opcao == "3":
+                    MAX_DOWNLOADS_SIMULTANEOS = int(valor)
+                else:
+                    MAX_POR_HOST = int(valor)
+                salvar_config()
+                print("\033[1;32m[✓] Configuração atualizada\033[0m")
+            else:
+                print("\033[1;31m[!] Valor inválido.\033[0m")
+            sleep(1)
         else:
             print("\033[1;31m[!] Opção inválida. Tente novamente.\033[0m")
             sleep(1)
@@ -505,6 +3742,8 @@ def mostrar_menu_principal():
 \033[0m""")
 
 def main():
+    inicio = time()
+    carregar_config()
     clear_screen()
     mostrar_banner()
 
@@ -517,17 +3756,28 @@ def main():
         if not os.path.exists(PASTA_DOWNLOADS):
             os.makedirs(PASTA_DOWNLOADS, mode=0o755, exist_ok=True)
 
+    if lotes_interrompidos():
+        print("\033[1;33m[•] Há um lote de downloads interrompido. Use a opção 8 ou 9 para retomar.\033[0m")
+
+    # Primeira amostra do aparelho (e o teste de escrita, se vencido) fora do caminho do menu
+    if AJUSTE_AUTOMATICO:
+        monitor_recursos().atual()
+
+    if VERBOSO:
+        print(f"\033[1;36m[•] Inicialização concluída em {time() - inicio:.2f}s\033[0m")
+
     while True:
         mostrar_menu_principal()
         opcao = input("\n\033[1;36m✨ Escolha uma opção [0-9]: \033[0m").strip()
 
         if opcao == "0":
+            mostrar_resumo_metricas()
             print("\n\033[1;32m[✓] Programa encerrado.\033[0m")
             break
         elif opcao == "7":
             mostrar_menu_config()
         elif opcao == "6":
-            atualizar_cookies()
+            atualizar_cookies(forcar=True)
         elif opcao == "5":
             atualizar_ferramentas()
         elif opcao == "8":
@@ -545,21 +3795,642 @@ def main():
                 listar_formatos(link)
             elif opcao == "3":
                 mostrar_menu_audio_formatos()
-                opcao_audio = input("\n\033[1;36m🎵 Escolha o formato [1-6]: \033[0m").strip()
-                if opcao_audio in FORMATOS_AUDIO:
-                    formato = FORMATOS_AUDIO[opcao_audio]
-                    if baixar_video(link, formato['code'], None, formato['params']):
+                opcao_audio = input("\n\033[1;36m🎵 Escolha o(s) formato(s) [1-6, ex: 1,3]: \033[0m").strip()
+                alvos = alvos_audio(opcao_audio)
+                if alvos and parece_playlist(link):
+                    baixar_playlist(link, 'audio', ','.join(alvos))
+                elif alvos:
+                    if baixar_audio(link, alvos, trechos=perguntar_trechos(link)).result():
                         print(f"\033[1;32m[✓] Arquivo salvo em: {PASTA_DOWNLOADS}\033[0m")
+            elif opcao == "1" and parece_playlist(link):
+                baixar_playlist(link, 'mp4')
             elif opcao == "1":
-                if baixar_video(link, 'mp4'):
+                if baixar_video(link, 'mp4', trechos=perguntar_trechos(link)):
                     print(f"\033[1;32m[✓] Arquivo salvo em: {PASTA_DOWNLOADS}\033[0m")
             elif opcao == "2":
                 listar_formatos(link)
         else:
             print("\033[1;31m[!] Opção inválida. Tente novamente.\033[0m")
 
+def ler_urls(fontes, arquivo=None):
+    """Gera as URLs sob demanda a partir de argumentos, arquivo ou stdin ('-')"""
+    def linhas(origem):
+        for linha in origem:
+            linha = linha.strip()
+            if linha and not linha.startswith('#'):
+                yield linha
+
+    for fonte in fontes:
+        if fonte == '-':
+            yield from linhas(sys.stdin)
+        else:
+            yield fonte
+    if arquivo:
+        with (sys.stdin if arquivo == '-' else open(arquivo)) as f:
+            yield from linhas(f)
+
+def _filtrar_urls_validas(urls, emitir):
+    """Descarta URLs inválidas, emitindo um evento de erro para cada uma"""
+    for url in urls:
+        if url.startswith(('http://', 'https://')):
+            yield url
+        else:
+            emitir({'evento': 'erro', 'url': url, 'erro': 'URL inválida'})
+
+def criar_parser():
+    """Argumentos do modo não interativo"""
+    parser = argparse.ArgumentParser(
+        prog="wolf.py",
+        description="Wolf Video Downloader. Sem URLs abre o menu interativo; com URLs, "
+                    "arquivo ou stdin ('-') baixa sem perguntas e emite uma linha JSON por job.")
+    parser.add_argument('urls', nargs='*', help="URLs para baixar ('-' lê do stdin)")
+    parser.add_argument('-a', '--arquivo', help="arquivo com uma URL por linha ('-' para stdin)")
+    parser.add_argument('-m', '--modo', choices=['video', 'audio'], default='video', help="tipo de download")
+    parser.add_argument('-q', '--qualidade', default='1',
+                        help="chave de FORMATOS_VIDEO ou altura como 720p (modo video), ou chave(s) de FORMATOS_AUDIO "
+                             "separadas por vírgula (modo audio, ex: 1,3)")
+    parser.add_argument('-o', '--saida', help=f"pasta de destino (padrão: {PASTA_DOWNLOADS})")
+    parser.add_argument('-w', '--workers', type=int, default=MAX_DOWNLOADS_SIMULTANEOS,
+                        help="downloads simultâneos")
+    parser.add_argument('--por-host', type=int, default=MAX_POR_HOST, help="downloads simultâneos por host")
+    parser.add_argument('--playlist', action='store_true',
+                        help="trata todas as URLs como playlists/canais (detectado automaticamente no YouTube)")
+    parser.add_argument('--itens', help="itens das playlists a baixar, ex: 1-10,15,30-")
+    parser.add_argument('--trecho',
+                        help="baixa só os trechos indicados, ex: 1:30-4:00,10:00- ou uma regex de capítulo")
+    parser.add_argument('--corte-preciso', action='store_true',
+                        help="corta os trechos no ponto exato (recodifica as pontas)")
+    parser.add_argument('--parar-apos', type=int,
+                        help="encerra a expansão após N itens seguidos já sincronizados")
+    parser.add_argument('--conversoes', type=int,
+                        help="conversões de áudio simultâneas (padrão: uma por núcleo)")
+    parser.add_argument('--aceleracao', choices=list(PERFIS_ACELERACAO), help="perfil de aceleração padrão")
+    parser.add_argument('--limite', type=int, help="limite global de banda em KB/s (0 = sem limite)")
+    parser.add_argument('--sem-ajuste', action='store_true',
+                        help="não ajusta downloads, fragmentos e threads do ffmpeg ao estado do aparelho")
+    parser.add_argument('--retomar', action='store_true', help="retoma o último lote interrompido")
+    parser.add_argument('--reconstruir-indice', action='store_true',
+                        help="reconstrói o índice de downloads e sai")
+    parser.add_argument('--deduplicar', nargs='?', const=True, choices=ACOES_DEDUPLICACAO,
+                        help="procura arquivos de conteúdo idêntico na pasta de destino, aplica a ação "
+                             "(padrão: a configurada; 'desativado' só lista) e sai")
+    parser.add_argument('--daemon', action='store_true',
+                        help="fica em execução atendendo a API local de jobs (POST/GET/DELETE /jobs, GET /eventos)")
+    parser.add_argument('--porta', type=int, default=PORTA_DAEMON, help="porta da API do daemon em 127.0.0.1")
+    parser.add_argument('--enviar', action='store_true',
+                        help="envia as URLs ao daemon em execução em vez de baixar neste processo")
+    parser.add_argument('-v', '--verbose', action='store_true', help="mostra tempos de inicialização")
+    return parser
+
+def resolver_qualidade(modo, qualidade):
+    """Converte modo e chave de qualidade em (formato, qualidade, params_extra);
+    lança ValueError com a mensagem para o usuário se forem inválidos"""
+    qualidade = str(qualidade)
+    if modo == 'video':
+        if qualidade in FORMATOS_VIDEO:
+            return 'mp4', FORMATOS_VIDEO[qualidade]['code'], None
+        if altura_maxima(qualidade):
+            return 'mp4', CODIGOS_LEGADOS.get(qualidade, qualidade), None
+        raise ValueError(f"Qualidade inválida: {qualidade} "
+                         f"(use {', '.join(FORMATOS_VIDEO)} ou uma altura como 720p)")
+    if modo == 'audio':
+        alvos = alvos_audio(qualidade)
+        if not alvos:
+            raise ValueError(f"Formato inválido: {qualidade} (use {', '.join(FORMATOS_AUDIO)})")
+        return 'audio', ','.join(alvos), None
+    raise ValueError(f"Modo inválido: {modo} (use video ou audio)")
+
+def aplicar_opcoes_cli(argumentos):
+    """Aplica as opções comuns ao modo sem menu e ao daemon nas configurações globais"""
+    global PASTA_DOWNLOADS, VERBOSO, MODO_INTERATIVO, PERFIL_ACELERACAO, LIMITE_GLOBAL
+    global MAX_CONVERSOES_SIMULTANEAS, PLAYLIST_PARAR_APOS_CONHECIDOS, CORTE_PRECISO, AJUSTE_AUTOMATICO
+    VERBOSO = argumentos.verbose
+    MODO_INTERATIVO = False
+    if argumentos.aceleracao:
+        PERFIL_ACELERACAO = argumentos.aceleracao
+    if argumentos.limite is not None:
+        LIMITE_GLOBAL = argumentos.limite * 1024
+    if argumentos.conversoes is not None:
+        MAX_CONVERSOES_SIMULTANEAS = max(0, argumentos.conversoes)
+    if argumentos.parar_apos is not None:
+        PLAYLIST_PARAR_APOS_CONHECIDOS = max(0, argumentos.parar_apos)
+    if argumentos.corte_preciso:
+        CORTE_PRECISO = True
+    if argumentos.sem_ajuste:
+        AJUSTE_AUTOMATICO = False
+    if argumentos.saida:
+        PASTA_DOWNLOADS = os.path.abspath(os.path.expanduser(argumentos.saida))
+
+def executar_cli(argumentos):
+    """Modo não interativo: baixa as URLs recebidas e emite JSON por job no stdout"""
+    # Mensagens para humanos vão ao stderr; o stdout fica só com as linhas JSON
+    saida_json = sys.stdout
+    sys.stdout = sys.stderr
+    lock_json = threading.Lock()
+
+    aplicar_opcoes_cli(argumentos)
+    if argumentos.itens or argumentos.trecho:
+        try:
+            if argumentos.itens:
+                intervalos_itens(argumentos.itens)
+            if argumentos.trecho:
+                interpretar_trechos(argumentos.trecho)
+        except ValueError as e:
+            print(f"\033[1;31m[!] {e}\033[0m")
+            return 2
+
+    def emitir(evento):
+        with lock_json:
+            saida_json.write(json.dumps(evento, ensure_ascii=False) + "\n")
+            saida_json.flush()
+
+    try:
+        formato, qualidade, params_extra = resolver_qualidade(argumentos.modo, argumentos.qualidade)
+    except ValueError as e:
+        print(f"\033[1;31m[!] {e}\033[0m")
+        return 2
+
+    verificar_e_configurar_ambiente()
+
+    if argumentos.reconstruir_indice:
+        emitir(dict(evento='indice', **reconstruir_indice()))
+        return 0
+
+    if argumentos.deduplicar:
+        acao = DEDUPLICACAO if argumentos.deduplicar is True else argumentos.deduplicar
+        grupos = escanear_biblioteca(workers=argumentos.workers)
+        for original, *duplicados in grupos:
+            for caminho, estado in duplicados:
+                emitir({'evento': 'duplicado', 'arquivo': caminho, 'original': original[0], 'bytes': estado.st_size})
+        quantidade, economizados = aplicar_deduplicacao(
+            grupos, acao, lambda original, caminho, feito: emitir(
+                {'evento': 'deduplicado', 'arquivo': caminho, 'original': original, 'acao': feito}))
+        emitir({'evento': 'deduplicacao', 'grupos': len(grupos), 'arquivos': quantidade, 'bytes': economizados})
+        return 0
+
+    def ao_concluir(resultado):
+        if resultado.get('ignorado'):
+            status = 'ignorado'
+        else:
+            status = 'ok' if resultado.get('sucesso') else 'falhou'
+        evento = {
+            'evento': 'job', 'indice': resultado['indice'], 'url': resultado['url'], 'status': status,
+            'arquivo': resultado.get('arquivo'), 'bytes': resultado.get('bytes', 0),
+            'duracao': round(resultado.get('duracao', 0), 3), 'log': resultado.get('log'),
+        }
+        if resultado.get('arquivos'):
+            evento['arquivos'] = resultado['arquivos']
+        if resultado.get('economizados'):
+            evento['economizados'] = resultado['economizados']
+        if resultado.get('playlist'):
+            evento['playlist'] = resultado['playlist']
+        if status == 'falhou' and resultado.get('erro'):
+            evento['erro'] = resultado['erro']
+        emitir(evento)
+
+    if argumentos.retomar:
+        lotes = lotes_interrompidos()
+        if not lotes:
+            print("\033[1;33m[•] Nenhum lote interrompido para retomar\033[0m")
+            return 0
+        lote, formato, qualidade, params_extra, _, _, trechos = lotes[-1]
+        resultados = executar_lote(None, formato, qualidade, params_extra, argumentos.workers,
+                                   argumentos.por_host, lote=lote, ao_concluir=ao_concluir, trechos=trechos)
+    else:
+        if not argumentos.urls and not argumentos.arquivo:
+            print("\033[1;31m[!] Nenhuma URL fornecida\033[0m")
+            return 2
+        urls = _filtrar_urls_validas(ler_urls(argumentos.urls, argumentos.arquivo), emitir)
+        urls = expandir_urls(urls, perfil_download(formato, qualidade, params_extra, argumentos.trecho),
+                             argumentos.itens, argumentos.playlist)
+        resultados = executar_lote(urls, formato, qualidade, params_extra, argumentos.workers,
+                                   argumentos.por_host, ao_concluir=ao_concluir, trechos=argumentos.trecho)
+
+    return 0 if all(r.get('sucesso') for r in resultados) else 1
+
+class ServicoWolf:
+    """Jobs do modo daemon: um pool fixo de workers com motor, caches e cookies aquecidos,
+    estado em memória para a API e eventos para quem acompanha o progresso"""
+
+    def __init__(self, workers=None, por_host=None):
+        self.workers = max(1, workers or MAX_DOWNLOADS_SIMULTANEOS)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="daemon")
+        self.limitador = LimitadorHosts(por_host or MAX_POR_HOST)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.lotes_cancelados = set()
+        self.assinantes = []
+        self.ultimo_progresso = {}
+        self.inicio = time()
+        self.parar = threading.Event()
+
+    def publicar(self, evento):
+        """Entrega o evento a todos os clientes de /eventos (clientes lentos perdem eventos)"""
+        with self.lock:
+            assinantes = list(self.assinantes)
+        for fila in assinantes:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                pass
+
+    def assinar(self):
+        fila = queue.Queue(maxsize=1000)
+        with self.lock:
+            self.assinantes.append(fila)
+            ativos = [dict(job) for job in self.jobs.values()
+                      if job['estado'] in ('pendente', 'executando', 'convertendo')]
+        for job in ativos:
+            fila.put_nowait(dict(job, evento='job'))
+        return fila
+
+    def cancelar_assinatura(self, fila):
+        with self.lock:
+            if fila in self.assinantes:
+                self.assinantes.remove(fila)
+
+    def _atualizar(self, job_id, **campos):
+        with self.lock:
+            job = self.jobs[job_id]
+            job.update(campos)
+            evento = dict(job, evento='job')
+        self.publicar(evento)
+
+    def estado(self):
+        with self.lock:
+            contagem = {}
+            for job in self.jobs.values():
+                contagem[job['estado']] = contagem.get(job['estado'], 0) + 1
+        return {'pid': os.getpid(), 'ativo_ha': round(time() - self.inicio), 'workers': self.workers,
+                'jobs': contagem, 'pasta_downloads': PASTA_DOWNLOADS, 'limite_global': limite_global_atual()}
+
+    def listar(self, estado=None):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values() if estado is None or job['estado'] == estado]
+
+    def consultar(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def enviar(self, urls, modo='video', qualidade='1', itens=None, playlist=False, trechos=None):
+        """Cria os jobs de uma submissão; playlists e canais são expandidos em segundo plano"""
+        formato, qualidade, params_extra = resolver_qualidade(modo, qualidade)
+        if itens:
+            intervalos_itens(itens)
+        if trechos:
+            interpretar_trechos(trechos)
+        lote = f"daemon_{criar_lote()}"
+        diretos = [url for url in urls if not (playlist or parece_playlist(url))]
+        colecoes = [url for url in urls if playlist or parece_playlist(url)]
+        jobs = []
+        for indice, url in enumerate(diretos, 1):
+            job = adicionar_job(lote, indice, url, formato, qualidade, params_extra, trechos=trechos)
+            jobs.append(self._agendar(job, lote, formato, qualidade, params_extra, trechos))
+        if colecoes:
+            threading.Thread(target=self._expandir, daemon=True,
+                             args=(lote, colecoes, formato, qualidade, params_extra, itens, len(diretos),
+                                   trechos)).start()
+        return {'lote': lote, 'jobs': jobs, 'expandindo': colecoes}
+
+    def _expandir(self, lote, urls, formato, qualidade, params_extra, itens, indice, trechos=None):
+        perfil = perfil_download(formato, qualidade, params_extra, trechos)
+        try:
+            for url, playlist in expandir_urls(urls, perfil, itens, forcar=True):
+                if lote in self.lotes_cancelados or self.parar.is_set():
+                    break
+                indice += 1
+                job = adicionar_job(lote, indice, url, formato, qualidade, params_extra, playlist, trechos)
+                self._agendar(job, lote, formato, qualidade, params_extra, trechos)
+        except Exception as e:
+            print(f"\033[1;31m[!] Erro ao expandir {', '.join(urls)}: {e}\033[0m")
+        self.publicar({'evento': 'expansao_concluida', 'lote': lote, 'itens': indice})
+
+    def _agendar(self, job, lote, formato, qualidade, params_extra, trechos=None):
+        job_id, indice, url, _, playlist = job
+        publico = {'id': job_id, 'lote': lote, 'indice': indice, 'url': url,
+                   'modo': 'audio' if formato == 'audio' else 'video', 'qualidade': qualidade,
+                   'playlist': playlist, 'trechos': trechos, 'estado': 'pendente', 'criado_em': time(),
+                   'progresso': None, 'arquivo': None, 'bytes': 0, 'log': None}
+        with self.lock:
+            self.jobs[job_id] = publico
+        self.publicar(dict(publico, evento='job'))
+        self.executor.submit(self._executar, job, lote, formato, qualidade, params_extra, trechos)
+        return dict(publico)
+
+    def _executar(self, job, lote, formato, qualidade, params_extra, trechos=None):
+        job_id = job[0]
+        with self.lock:
+            publico = self.jobs.get(job_id)
+            if publico is None or publico['estado'] != 'pendente' or self.parar.is_set():
+                return
+        self._atualizar(job_id, estado='executando', iniciado_em=time())
+        pasta_log = os.path.join(PASTA_LOGS, f"lote_{lote}")
+        os.makedirs(pasta_log, exist_ok=True)
+        try:
+            resultado = _executar_job(job, None, formato, qualidade, params_extra, self.limitador, pasta_log,
+                                      functools.partial(self._progresso, job_id), trechos)
+        except Exception as e:
+            print(f"\033[1;31m[!] Erro inesperado no job {job_id}: {e}\033[0m")
+            atualizar_job(job_id, estado='falhou')
+            resultado = {'sucesso': False, 'bytes': 0}
+        conversao = resultado.pop('conversao', None)
+        if conversao is None:
+            self._concluir(job_id, resultado)
+        else:
+            self._atualizar(job_id, estado='convertendo', progresso=None)
+            conversao.add_done_callback(lambda _: self._concluir(job_id, resultado))
+
+    def _progresso(self, job_id, d):
+        """Repassa o progresso do hook do yt-dlp (no máximo 2 eventos por segundo por job)"""
+        agora = time()
+        with self.lock:
+            if d['status'] == 'downloading' and agora - self.ultimo_progresso.get(job_id, 0) < 0.5:
+                return
+            self.ultimo_progresso[job_id] = agora
+            progresso = {'status': d['status'], 'baixado': d.get('downloaded_bytes') or 0,
+                         'total': d.get('total_bytes') or d.get('total_bytes_estimate'),
+                         'velocidade': d.get('speed'), 'eta': d.get('eta')}
+            self.jobs[job_id]['progresso'] = progresso
+        self.publicar(dict(progresso, evento='progresso', id=job_id))
+
+    def _concluir(self, job_id, resultado):
+        if _cancelamento.is_set() and not resultado.get('sucesso'):
+            estado = 'pendente'   # encerramento do daemon: o job volta na próxima execução
+        elif resultado.get('cancelado'):
+            estado = 'cancelado'
+        elif resultado.get('ignorado'):
+            estado = 'ignorado'
+        else:
+            estado = 'concluido' if resultado.get('sucesso') else 'falhou'
+        campos = {'estado': estado, 'arquivo': resultado.get('arquivo'), 'bytes': resultado.get('bytes', 0),
+                  'duracao': round(resultado.get('duracao', 0), 3), 'log': resultado.get('log')}
+        if resultado.get('arquivos'):
+            campos['arquivos'] = resultado['arquivos']
+        if resultado.get('economizados'):
+            campos['economizados'] = resultado['economizados']
+        if estado == 'falhou' and resultado.get('erro'):
+            campos['erro'] = resultado['erro']
+        self._atualizar(job_id, **campos)
+        if estado != 'pendente':
+            conexao = banco()
+            conexao.execute("DELETE FROM fila WHERE id = ?", (job_id,))
+            conexao.commit()
+        _jobs_cancelados.discard(job_id)
+        self._podar_historico()
+
+    def _podar_historico(self):
+        with self.lock:
+            encerrados = [job_id for job_id, job in self.jobs.items()
+                          if job['estado'] not in ('pendente', 'executando', 'convertendo')]
+            for job_id in encerrados[:max(0, len(encerrados) - MAX_JOBS_HISTORICO)]:
+                del self.jobs[job_id]
+                self.ultimo_progresso.pop(job_id, None)
+
+    def cancelar(self, job_id):
+        """Cancela um job: se ainda está na fila nem começa; se está baixando, para no próximo progresso"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['estado'] not in ('pendente', 'executando', 'convertendo'):
+                return False
+            _jobs_cancelados.add(job_id)
+            na_fila = job['estado'] == 'pendente'
+            if na_fila:
+                job['estado'] = 'cancelado'
+        if na_fila:
+            self._concluir(job_id, {'cancelado': True})
+        return True
+
+    def cancelar_lote(self, lote):
+        self.lotes_cancelados.add(lote)
+        with self.lock:
+            ids = [job_id for job_id, job in self.jobs.items() if job['lote'] == lote]
+        return [job_id for job_id in ids if self.cancelar(job_id)]
+
+    def retomar(self):
+        """Reagenda os jobs que ficaram pendentes quando o daemon foi encerrado"""
+        total = 0
+        for lote, formato, qualidade, params_extra, _, _, trechos in lotes_interrompidos(daemon=True):
+            for job in _jobs_do_lote(lote, None, formato, qualidade, params_extra, trechos):
+                self._agendar(job, lote, formato, qualidade, params_extra, trechos)
+                total += 1
+        if total:
+            print(f"\033[1;33m[•] {total} job(s) pendente(s) da execução anterior retomado(s)\033[0m")
+
+    def manter_cookies(self):
+        """Renova os cookies periodicamente enquanto o daemon estiver no ar"""
+        while not self.parar.wait(INTERVALO_COOKIES):
+            if ATUALIZAR_COOKIES_AUTO:
+                atualizar_cookies(silencioso=True)
+
+    def encerrar(self):
+        """Interrompe os downloads em andamento; os jobs ficam pendentes na fila para a próxima execução"""
+        self.parar.set()
+        _cancelamento.set()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+class _ApiDaemon(BaseHTTPRequestHandler):
+    """API local: POST /jobs, GET /jobs[/id], DELETE /jobs/id, DELETE /lotes/id, GET /eventos, GET /estado"""
+
+    servico = None
+    token = None
+
+    def log_message(self, formato, *args):
+        if VERBOSO:
+            print(f"\033[1;36m[•] API: {formato % args}\033[0m")
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _rota(self):
+        """Confere o token e devolve (partes do caminho, parâmetros da query) ou None se já respondeu"""
+        if not secrets.compare_digest(self.headers.get('X-Wolf-Token', ''), self.token):
+            self._responder(401, {'erro': 'Token ausente ou inválido (veja ' + ARQUIVO_DAEMON + ')'})
+            return None
+        url = urlparse(self.path)
+        return [parte for parte in url.path.split('/') if parte], dict(parse_qsl(url.query))
+
+    def _job_id(self, partes):
+        if len(partes) == 2 and partes[1].isdigit():
+            return int(partes[1])
+        self._responder(404, {'erro': 'Job não encontrado'})
+        return None
+
+    def do_GET(self):
+        rota = self._rota()
+        if rota is None:
+            return
+        partes, query = rota
+        if partes == ['estado']:
+            self._responder(200, self.servico.estado())
+        elif partes == ['jobs']:
+            self._responder(200, {'jobs': self.servico.listar(query.get('estado'))})
+        elif partes[:1] == ['jobs']:
+            job_id = self._job_id(partes)
+            if job_id is None:
+                return
+            job = self.servico.consultar(job_id)
+            if job is None:
+                self._responder(404, {'erro': 'Job não encontrado'})
+            else:
+                self._responder(200, job)
+        elif partes == ['eventos']:
+            self._transmitir_eventos(int(query['job']) if query.get('job', '').isdigit() else None)
+        else:
+            self._responder(404, {'erro': 'Rota desconhecida'})
+
+    def do_POST(self):
+        rota = self._rota()
+        if rota is None:
+            return
+        if rota[0] != ['jobs']:
+            self._responder(404, {'erro': 'Rota desconhecida'})
+            return
+        try:
+            corpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            urls = corpo.get('urls') or ([corpo['url']] if corpo.get('url') else [])
+            urls = [url for url in urls if isinstance(url, str) and url.startswith(('http://', 'https://'))]
+            if not urls:
+                raise ValueError("Nenhuma URL válida (use 'url' ou 'urls' com http:// ou https://)")
+            resposta = self.servico.enviar(urls, corpo.get('modo', 'video'), corpo.get('qualidade', '1'),
+                                           corpo.get('itens'), bool(corpo.get('playlist')), corpo.get('trechos'))
+        except (ValueError, AttributeError, TypeError) as e:
+            self._responder(400, {'erro': str(e)})
+            return
+        self._responder(201, resposta)
+
+    def do_DELETE(self):
+        rota = self._rota()
+        if rota is None:
+            return
+        partes = rota[0]
+        if partes[:1] == ['lotes'] and len(partes) == 2:
+            self._responder(200, {'cancelados': self.servico.cancelar_lote(partes[1])})
+        elif partes[:1] == ['jobs']:
+            job_id = self._job_id(partes)
+            if job_id is None:
+                return
+            if self.servico.cancelar(job_id):
+                self._responder(200, self.servico.consultar(job_id) or {'id': job_id})
+            else:
+                self._responder(409, {'erro': 'Job inexistente ou já encerrado'})
+        else:
+            self._responder(404, {'erro': 'Rota desconhecida'})
+
+    def _transmitir_eventos(self, job_id=None):
+        """Uma linha JSON por evento até o cliente desconectar (com 'ping' a cada 15s sem eventos)"""
+        fila = self.servico.assinar()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            while not self.servico.parar.is_set():
+                try:
+                    evento = fila.get(timeout=15)
+                except queue.Empty:
+                    evento = {'evento': 'ping'}
+                if job_id is not None and evento.get('id', job_id) != job_id:
+                    continue
+                self.wfile.write((json.dumps(evento, ensure_ascii=False) + "\n").encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.servico.cancelar_assinatura(fila)
+
+def executar_daemon(argumentos):
+    """Modo daemon: prepara o ambiente uma única vez e atende a API local até ser interrompido"""
+    aplicar_opcoes_cli(argumentos)
+    verificar_e_configurar_ambiente()
+    if carregar_yt_dlp() is None:
+        print("\033[1;33m[•] Motor interno indisponível: os jobs usarão o yt-dlp em subprocesso\033[0m")
+
+    servico = ServicoWolf(argumentos.workers, argumentos.por_host)
+    token = secrets.token_urlsafe(24)
+    api = type('ApiDaemon', (_ApiDaemon,), {'servico': servico, 'token': token})
+    try:
+        servidor = ThreadingHTTPServer(('127.0.0.1', argumentos.porta), api)
+    except OSError as e:
+        print(f"\033[1;31m[!] Não foi possível abrir a porta {argumentos.porta}: {e}\033[0m")
+        return 1
+
+    # Clientes (inclusive o --enviar) descobrem porta e token por este arquivo, legível só pelo usuário
+    os.makedirs(PASTA_WOLF, exist_ok=True)
+    fd = os.open(ARQUIVO_DAEMON, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'porta': servidor.server_address[1], 'token': token, 'pid': os.getpid()}, f)
+
+    def interromper(sinal, quadro):
+        raise KeyboardInterrupt
+    # SIGTERM (kill, gerenciadores de serviço) encerra como o Ctrl+C, preservando a fila
+    signal.signal(signal.SIGTERM, interromper)
+
+    servico.retomar()
+    threading.Thread(target=servico.manter_cookies, daemon=True).start()
+    print(f"\033[1;32m[✓] Daemon ouvindo em http://127.0.0.1:{servidor.server_address[1]} "
+          f"com {servico.workers} worker(s) (token em {ARQUIVO_DAEMON})\033[0m")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n\033[1;33m[•] Encerrando o daemon; jobs em andamento ficam pendentes para a próxima execução\033[0m")
+    finally:
+        servidor.server_close()
+        _remover_silencioso(ARQUIVO_DAEMON)
+        servico.encerrar()
+        mostrar_resumo_metricas()
+    return 0
+
+def enviar_ao_daemon(argumentos):
+    """Envia as URLs ao daemon em execução, sem preparar o ambiente, e emite o JSON de cada job criado"""
+    try:
+        with open(ARQUIVO_DAEMON) as f:
+            daemon = json.load(f)
+    except (OSError, ValueError):
+        print("\033[1;31m[!] Nenhum daemon em execução (inicie com: python wolf.py --daemon)\033[0m", file=sys.stderr)
+        return 2
+
+    def emitir(evento):
+        print(json.dumps(evento, ensure_ascii=False))
+
+    urls = list(_filtrar_urls_validas(ler_urls(argumentos.urls, argumentos.arquivo), emitir))
+    if not urls:
+        print("\033[1;31m[!] Nenhuma URL fornecida\033[0m", file=sys.stderr)
+        return 2
+    corpo = {'urls': urls, 'modo': argumentos.modo, 'qualidade': argumentos.qualidade,
+             'itens': argumentos.itens, 'playlist': argumentos.playlist, 'trechos': argumentos.trecho}
+    try:
+        resposta = sessao_http().post(f"http://127.0.0.1:{daemon['porta']}/jobs", json=corpo,
+                                      headers={'X-Wolf-Token': daemon['token']}, timeout=30)
+    except requests.RequestException as e:
+        print(f"\033[1;31m[!] Daemon não respondeu: {e}\033[0m", file=sys.stderr)
+        return 1
+    dados = resposta.json()
+    if resposta.status_code != 201:
+        print(f"\033[1;31m[!] {dados.get('erro')}\033[0m", file=sys.stderr)
+        return 2
+    for job in dados['jobs']:
+        emitir(dict(job, evento='job'))
+    for url in dados['expandindo']:
+        emitir({'evento': 'expandindo', 'lote': dados['lote'], 'url': url})
+    return 0
+
 if __name__ == "__main__":
+    carregar_config()
+    argumentos = criar_parser().parse_args()
     try:
+        if argumentos.daemon:
+            sys.exit(executar_daemon(argumentos))
+        if argumentos.enviar:
+            sys.exit(enviar_ao_daemon(argumentos))
+        if (argumentos.urls or argumentos.arquivo or argumentos.retomar or argumentos.reconstruir_indice
+                or argumentos.deduplicar):
+            sys.exit(executar_cli(argumentos))
         main()
     except KeyboardInterrupt:
         print("\n\033[1;31m[!] Programa interrompido pelo usuário.\033[0m")